@@ -0,0 +1,126 @@
+"""Load-test the Flask routes against the local stand-in origin.
+
+Usage: python bench/bench_app.py [--requests 200] [--concurrency 8]
+                                 [--latency 0.1] [--jitter 0.03] [--no-cache]
+
+Reports requests/sec and p50/p95/p99 latency per endpoint. --no-cache
+bypasses the response cache so every request pays the fetch + parse path.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from origin import StandInOrigin
+
+DATA_CONTENT = base64.b64encode(json.dumps({"id": 170000, "i": 0, "q": "720p"}).encode()).decode()
+
+ENDPOINTS = [
+    ("GET", "/", None),
+    ("GET", "/ongoing", None),
+    ("GET", "/list", None),
+    ("GET", "/genre", None),
+    ("GET", "/genres/action", None),
+    ("GET", "/search?s=kaisen", None),
+    ("GET", "/anime/fixture-anime", None),
+    ("GET", "/episode/fixture-episode-1", None),
+    ("GET", "/api/home", None),
+    ("GET", "/api/anime/fixture-anime?fields=title,episodes.slug", None),
+    ("GET", "/api/episode/fixture-episode-1", None),
+    ("POST", "/api/resolve", {"data_content": DATA_CONTENT}),
+    ("POST", "/api/resolve", {"url": "/_ext/desustream/dstream/ondesu/hd/v3/index.php?id=abc123"}),
+]
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_endpoint(base_url, method, path, body, total, concurrency):
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.request(method, base_url + path, json=body, timeout=60)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+    return {
+        "rps": total / wall,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="origin latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="origin latency jitter in seconds")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the response cache")
+    args = parser.parse_args()
+
+    origin = StandInOrigin(latency=args.latency, jitter=args.jitter)
+    os.environ['OTAKUDESU_BASE_URL'] = origin.start()
+    os.environ['OTAKUDESU_EXTRACTOR_ALIASES'] = ",".join(
+        f"{name}={prefix}" for prefix, name in origin.extractor_aliases().items())
+    # The upstream rate limit protects the real site; against the stand-in it would be all the cold path measures
+    os.environ.setdefault('OTAKUDESU_RATE', '1000000')
+    os.environ.setdefault('OTAKUDESU_BURST', '1000000')
+
+    import app as app_module
+    if args.no_cache:
+        app_module.scraper = app_module.upstream
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{'endpoint':<30}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    try:
+        for method, path, body in ENDPOINTS:
+            if body and body.get("url", "").startswith("/"):
+                # origin-relative stream host URL
+                body = {"url": os.environ['OTAKUDESU_BASE_URL'] + body["url"]}
+            r = run_endpoint(base_url, method, path, body, args.requests, args.concurrency)
+            print(f"{method + ' ' + path:<30}{r['rps']:>9.1f}{r['p50'] * 1000:>9.1f}"
+                  f"{r['p95'] * 1000:>9.1f}{r['p99'] * 1000:>9.1f}{r['errors']:>8}")
+        print(f"origin requests: {origin.requests}")
+    finally:
+        server.shutdown()
+        origin.stop()
+
+
+if __name__ == '__main__':
+    main()
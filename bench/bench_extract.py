@@ -0,0 +1,50 @@
+"""Micro-benchmark: BeautifulSoup host-page parsers vs the byte-scanning extractors.
+
+Usage: python bench/bench_extract.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from extractors import find_extractor
+from scraper import OtakudesuScraper
+from bench_parse import load_fixture
+
+# fixture page -> (URL it was recorded from, soup parser giving the same first result)
+PAGES = {
+    "desustream": ("https://desustream.info/dstream/ondesu/hd/v3/index.php?id=abc123",
+                   lambda s, soup: s.parse_desustream(soup)),
+    "blogger": ("https://www.blogger.com/video.g?token=AD6v5dyTESTTOKEN",
+                lambda s, soup: s.parse_blogger(soup)),
+}
+
+
+def first_result(streams, next_url):
+    return streams[0]['url'] if streams else next_url
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - start) / iterations, result
+
+
+def main(iterations=200):
+    scraper = OtakudesuScraper(strained_pages=())
+    print(f"{'page':<14}{'bytes':>8}{'soup ms':>10}{'extract ms':>12}{'speedup':>9}")
+    for page, (url, parse) in PAGES.items():
+        content = load_fixture(page)
+        extractor = find_extractor(url)
+        soup_time, soup_result = timed(lambda: parse(scraper, scraper.make_soup(content, page)), iterations)
+        extract_time, extracted = timed(lambda: extractor.extract(content, url), iterations)
+        if first_result(*extracted) != soup_result:
+            raise SystemExit(f"{page}: extractor output differs from the soup parser")
+        print(f"{page:<14}{len(content):>8}{soup_time * 1000:>10.3f}{extract_time * 1000:>12.3f}"
+              f"{soup_time / extract_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
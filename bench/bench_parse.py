@@ -0,0 +1,59 @@
+"""Micro-benchmark: full BeautifulSoup parse vs PAGE_FILTERS subtree parse.
+
+Usage: python bench/bench_parse.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from parsing import PAGE_FILTERS, STRAINED_PAGES
+from scraper import OtakudesuScraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# fixture page -> parser applied to its soup
+PARSERS = {
+    "home": lambda s, soup: s.parse_home(soup),
+    "ongoing": lambda s, soup: s.parse_ongoing(soup),
+    "anime_list": lambda s, soup: s.parse_anime_list(soup),
+    "genre_list": lambda s, soup: s.parse_genre_list(soup),
+    "genre": lambda s, soup: s.parse_genre_page(soup),
+    "search": lambda s, soup: s.parse_search(soup),
+    "anime_details": lambda s, soup: s.parse_anime_details(soup, "fixture"),
+    "episode_details": lambda s, soup: s.parse_episode_details(soup, "fixture"),
+    "desustream": lambda s, soup: s.parse_desustream(soup),
+    "blogger": lambda s, soup: s.parse_blogger(soup),
+}
+
+
+def load_fixture(page):
+    with open(os.path.join(FIXTURES, f"{page}.html"), 'rb') as f:
+        return f.read()
+
+
+def time_parse(scraper, page, content, iterations):
+    parse = PARSERS[page]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = parse(scraper, scraper.make_soup(content, page))
+    return (time.perf_counter() - start) / iterations, result
+
+
+def main(iterations=20):
+    full = OtakudesuScraper(strained_pages=())
+    strained = OtakudesuScraper(strained_pages=PAGE_FILTERS)
+    print(f"{'page':<18}{'bytes':>9}{'full ms':>10}{'strained ms':>13}{'speedup':>9}  default")
+    for page in PARSERS:
+        content = load_fixture(page)
+        full_time, full_result = time_parse(full, page, content, iterations)
+        strained_time, strained_result = time_parse(strained, page, content, iterations)
+        if full_result != strained_result:
+            raise SystemExit(f"{page}: strained parse output differs from full parse")
+        print(f"{page:<18}{len(content):>9}{full_time * 1000:>10.2f}{strained_time * 1000:>13.2f}"
+              f"{full_time / strained_time:>8.1f}x  {'strained' if page in STRAINED_PAGES else 'full'}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
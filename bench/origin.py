@@ -0,0 +1,175 @@
+"""Local stand-in for otakudesu.best serving the recorded fixture pages.
+
+Usage: python bench/origin.py [--port 8081] [--latency 0.15] [--jitter 0.05]
+then point the app at it with OTAKUDESU_BASE_URL=http://127.0.0.1:8081 and
+OTAKUDESU_EXTRACTOR_ALIASES as printed on startup.
+
+Links to the external stream hosts (desustream, blogger) in the served pages
+and embed responses are rewritten to /_ext/<host>/ on this server, so
+following an episode's default stream never leaves the machine.
+
+The checked-in fixtures are synthetic pages built to the live markup's
+structure (padded with filler og:x meta tags to live page sizes), not
+recordings; run bench/record.py to replace them with recorded pages.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# (method, path regex, fixture file); the first match wins
+ROUTES = [
+    ("GET", r"^/$", "home.html"),
+    ("GET", r"^/ongoing-anime/(page/\d+/)?$", "ongoing.html"),
+    ("GET", r"^/anime-list/$", "anime_list.html"),
+    ("GET", r"^/genre-list/$", "genre_list.html"),
+    ("GET", r"^/genres/[^/]+/(page/\d+/)?$", "genre.html"),
+    ("GET", r"^/anime/[^/]+/$", "anime_details.html"),
+    ("GET", r"^/episode/[^/]+/$", "episode_details.html"),
+    ("GET", r"^/_ext/desustream/", "desustream.html"),
+    ("GET", r"^/_ext/blogger/", "blogger.html"),
+]
+NONCE_ACTION = "aa1208d27f29ca340c92c66d1926f13f"
+# external host prefix -> stand-in path it is served under
+EXTERNAL_HOSTS = {
+    "desustream": "https://desustream.info/",
+    "blogger": "https://www.blogger.com/",
+}
+
+
+class StandInOrigin:
+    def __init__(self, fixtures=FIXTURES, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._cache = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def extractor_aliases(self):
+        """Prefixes for extractors.ALIASES / OTAKUDESU_EXTRACTOR_ALIASES covering the /_ext/ pages."""
+        return {f"{self.base_url}/_ext/{name}/": name for name in EXTERNAL_HOSTS}
+
+    def rewrite(self, body):
+        for name, prefix in EXTERNAL_HOSTS.items():
+            body = body.replace(prefix.encode(), f"{self.base_url}/_ext/{name}/".encode())
+        return body
+
+    def fixture(self, name):
+        body = self._cache.get(name)
+        if body is None:
+            with open(os.path.join(self.fixtures, name), 'rb') as f:
+                body = f.read()
+            if name == "embed.json":
+                embed = json.loads(body)
+                embed["data"] = base64.b64encode(self.rewrite(base64.b64decode(embed["data"]))).decode()
+                body = json.dumps(embed).encode()
+            else:
+                body = self.rewrite(body)
+            self._cache[name] = body
+        return body
+
+    def delay(self):
+        wait = self.latency + random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def route(self, method, raw_path, form=None):
+        parts = urlsplit(raw_path)
+        if method == "POST" and parts.path == "/wp-admin/admin-ajax.php":
+            action = (form or {}).get("action", [""])[0]
+            return "nonce.json" if action == NONCE_ACTION else "embed.json"
+        if method == "GET" and parts.path == "/" and "s" in parse_qs(parts.query):
+            return "search.html"
+        for route_method, pattern, name in ROUTES:
+            if method == route_method and re.match(pattern, parts.path):
+                return name
+        return None
+
+    def _handler(self):
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self, name):
+                origin.requests += 1
+                origin.delay()
+                if name is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = origin.fixture(name)
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                ctype = "application/json" if name.endswith(".json") else "text/html; charset=UTF-8"
+                self.send_header("Content-Type", ctype)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve(origin.route("GET", self.path))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+                self._serve(origin.route("POST", self.path, form))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random extra latency")
+    args = parser.parse_args()
+    origin = StandInOrigin(port=args.port, latency=args.latency, jitter=args.jitter)
+    print(f"Serving {FIXTURES} on {origin.base_url}")
+    aliases = ",".join(f"{name}={prefix}" for prefix, name in origin.extractor_aliases().items())
+    print(f"OTAKUDESU_EXTRACTOR_ALIASES={aliases}")
+    try:
+        origin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
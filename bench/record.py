@@ -0,0 +1,79 @@
+"""Record live otakudesu pages into bench/fixtures for offline benchmarking.
+
+Usage: python bench/record.py [--base-url https://otakudesu.best] [--query naruto]
+
+Overwrites the fixture files served by bench/origin.py: one page of each
+type, plus the admin-ajax nonce/embed responses for the recorded episode's
+first mirror and the desustream/blogger pages behind its default stream.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from scraper import OtakudesuScraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class Recorder:
+    def __init__(self, base_url=None, out=FIXTURES):
+        self.scraper = OtakudesuScraper(base_url=base_url)
+        self.out = out
+
+    def save(self, name, content):
+        with open(os.path.join(self.out, name), 'wb') as f:
+            f.write(content)
+        print(f"recorded {name} ({len(content)} bytes)")
+        return content
+
+    def get(self, name, url):
+        response = self.scraper.session.get(url, timeout=20)
+        response.raise_for_status()
+        return self.save(name, response.content)
+
+    def post(self, name, data):
+        response = self.scraper.session.post(self.scraper.BASE_URL + self.scraper.AJAX_PATH, data=data, timeout=20)
+        response.raise_for_status()
+        self.save(name, response.content)
+        return response.json()
+
+    def record(self, query):
+        s = self.scraper
+        home = s.parse_home(s.make_soup(self.get("home.html", s.BASE_URL + "/"), "home"))
+        self.get("ongoing.html", s.ongoing_url(1))
+        self.get("anime_list.html", f"{s.BASE_URL}/anime-list/")
+        genres = s.parse_genre_list(s.make_soup(self.get("genre_list.html", f"{s.BASE_URL}/genre-list/"), "genre_list"))
+        self.get("genre.html", s.genre_url(genres[0]['slug'] if genres else "action"))
+        self.get("search.html", s.search_url(query))
+
+        slug = home['ongoing'][0]['slug']
+        anime = s.parse_anime_details(s.make_soup(self.get("anime_details.html", f"{s.BASE_URL}/anime/{slug}/"), "anime_details"), slug)
+        episode_slug = anime['episodes'][0]['slug']
+        episode = s.parse_episode_details(
+            s.make_soup(self.get("episode_details.html", f"{s.BASE_URL}/episode/{episode_slug}/"), "episode_details"),
+            episode_slug)
+
+        mirrors = [m for q_mirrors in episode['mirrors'].values() for m in q_mirrors if m['data_content']]
+        if mirrors:
+            nonce = self.post("nonce.json", {"action": s.NONCE_ACTION}).get('data')
+            self.post("embed.json", s.build_embed_payload(mirrors[0]['data_content'], nonce))
+
+        if episode['default_stream']:
+            desustream = self.get("desustream.html", episode['default_stream'])
+            blogger_url = s.parse_desustream(s.make_soup(desustream, "desustream"))
+            if blogger_url:
+                self.get("blogger.html", blogger_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--query", default="naruto", help="search query to record")
+    args = parser.parse_args()
+    Recorder(base_url=args.base_url).record(args.query)
+
+
+if __name__ == '__main__':
+    main()
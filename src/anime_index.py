@@ -0,0 +1,50 @@
+from array import array
+
+
+def letter_of(title):
+    first = title[:1].upper()
+    return first if "A" <= first <= "Z" else "#"
+
+
+class AnimeEntry:
+    __slots__ = ("title", "slug", "url")
+
+    def __init__(self, title, slug, url):
+        self.title = title
+        self.slug = slug
+        self.url = url
+
+    def to_dict(self):
+        return {"title": self.title, "slug": self.slug, "url": self.url}
+
+
+class AnimeListIndex:
+    """Compact, precomputed view of the anime-list page for paginated reads.
+
+    Entries are __slots__ records in upstream order, and each first letter
+    maps to an array of positions, so a page or letter slice never copies
+    the whole catalog.
+    """
+
+    def __init__(self, items=()):
+        self.entries = []
+        self.by_letter = {}
+        for item in items:
+            position = len(self.entries)
+            self.entries.append(AnimeEntry(item['title'], item['slug'], item['url']))
+            self.by_letter.setdefault(letter_of(item['title']), array('I')).append(position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def letters(self):
+        return sorted(self.by_letter, key=lambda letter: (letter == "#", letter))
+
+    def page(self, page=1, per_page=100, letter=None):
+        """Returns (entries, total) for one page, optionally restricted to a first letter."""
+        page = max(page, 1)
+        start = (page - 1) * per_page
+        if letter:
+            positions = self.by_letter.get(letter.upper(), ())
+            return [self.entries[i] for i in positions[start:start + per_page]], len(positions)
+        return self.entries[start:start + per_page], len(self.entries)
@@ -1,58 +1,414 @@
-from flask import Flask, render_template, request, jsonify, abort
+import os
+import tempfile
+import threading
+import time
+from flask import Flask, Response, render_template, stream_template, request, jsonify, abort, g
+from flask import stream_with_context
+from flask import before_render_template, template_rendered
 from scraper import OtakudesuScraper
+from cache import CachedScraper, ResponseCache, LRUCache, SQLiteCache
+from stream_cache import StreamCache
+from search_index import SearchIndexer
+from catalog import CatalogStore
+from crawler import Crawler
+from anime_index import AnimeListIndex
+from genre_index import GenreIndex
+from resilience import UpstreamGuard, TokenBucket, SharedTokenBucket, CircuitBreaker
+from prefetch import Prefetcher
+from watcher import EpisodeWatcher, EventLog
+import extractors
+from extractors import find_extractor
+from image_proxy import ImageProxy, DEFAULT_WIDTH
+from render_cache import RenderCache, templates_version
+from serialize import parse_fields, project, encode, wants_msgpack
+import metrics
+from metrics import REGISTRY, ROUTE_SECONDS, RENDER_SECONDS, SlowRequestProfiler, register_stats
 
 app = Flask(__name__)
-scraper = OtakudesuScraper()
+
+# Optional on-disk tier shared by every worker process, e.g. OTAKUDESU_CACHE_DB=/tmp/otakudesu-cache.db
+cache_db = os.environ.get('OTAKUDESU_CACHE_DB')
+cache = ResponseCache(
+    memory=LRUCache(max_bytes=int(os.environ.get('OTAKUDESU_CACHE_BYTES', 64 * 1024 * 1024))),
+    disk=SQLiteCache(cache_db, max_entries=int(os.environ.get('OTAKUDESU_CACHE_ENTRIES', 50000))) if cache_db else None,
+)
+
+# One rate budget, retry policy and circuit breaker for every request to the origin;
+# OTAKUDESU_RATE_DB keeps the budget in a file shared by every worker process
+rate = float(os.environ.get('OTAKUDESU_RATE', 10))
+burst = int(os.environ.get('OTAKUDESU_BURST', 20))
+rate_db = os.environ.get('OTAKUDESU_RATE_DB')
+guard = UpstreamGuard(
+    limiter=SharedTokenBucket(rate_db, rate, burst) if rate_db else TokenBucket(rate, burst),
+    breaker=CircuitBreaker(threshold=float(os.environ.get('OTAKUDESU_BREAKER_THRESHOLD', 0.5)),
+                           cooldown=float(os.environ.get('OTAKUDESU_BREAKER_COOLDOWN', 30))),
+    retries=int(os.environ.get('OTAKUDESU_RETRIES', 2)),
+)
+
+# OTAKUDESU_ENGINE=async routes every upstream call through one pooled asyncio client
+base_url = os.environ.get('OTAKUDESU_BASE_URL')
+if os.environ.get('OTAKUDESU_ENGINE') == 'async':
+    from async_scraper import BlockingScraper
+    upstream = BlockingScraper(base_url=base_url, guard=guard)
+else:
+    upstream = OtakudesuScraper(base_url=base_url, guard=guard)
+
+# Resolved stream URLs survive restarts when OTAKUDESU_STREAM_CACHE points at a file
+streams = StreamCache(os.environ.get('OTAKUDESU_STREAM_CACHE', ':memory:'))
+scraper = CachedScraper(upstream, cache, streams=streams)
+
+# Built in the background on the first search; /search falls back upstream until it covers the query.
+# The indexer's detail crawl also fills the genre index behind /api/genre-index.
+genre_index = GenreIndex()
+search_indexer = SearchIndexer(scraper, genre_index=genre_index)
+
+# Warms the next episode and its default mirror after each episode page (OTAKUDESU_PREFETCH=0 disables)
+prefetcher = Prefetcher(scraper) if os.environ.get('OTAKUDESU_PREFETCH', '1') != '0' else None
+
+# Rendered HTML keyed by a hash of the template context; the hash is also the page's ETag
+render_cache = RenderCache(
+    max_bytes=int(os.environ.get('OTAKUDESU_RENDER_CACHE_BYTES', 32 * 1024 * 1024)),
+    version=os.environ.get('OTAKUDESU_BUILD_ID') or templates_version(os.path.join(app.root_path, app.template_folder)),
+)
+
+# Extra stream-host addresses, e.g. the stand-in origin's /_ext/ pages (see bench/origin.py)
+extractors.ALIASES.update(extractors.parse_aliases(os.environ.get('OTAKUDESU_EXTRACTOR_ALIASES', '')))
+
+# Cover images re-served resized from a disk LRU through /img/ (OTAKUDESU_IMAGE_PROXY=0 links the origin directly)
+images = None
+if os.environ.get('OTAKUDESU_IMAGE_PROXY', '1') != '0':
+    images = ImageProxy(
+        os.environ.get('OTAKUDESU_IMAGE_DIR', os.path.join(tempfile.gettempdir(), 'otakudesu-images')),
+        max_bytes=int(os.environ.get('OTAKUDESU_IMAGE_CACHE_BYTES', 256 * 1024 * 1024)),
+        secret=os.environ.get('OTAKUDESU_IMAGE_SECRET'),
+    )
+
+# Local catalog kept warm by the background crawler (OTAKUDESU_CATALOG_DB + OTAKUDESU_CRAWLER=1)
+CATALOG_MAX_AGE = 24 * 3600
+catalog_db = os.environ.get('OTAKUDESU_CATALOG_DB')
+catalog = CatalogStore(catalog_db) if catalog_db else None
+# Versioned episode log behind /api/anime/<slug>/episodes; in memory when there is no catalog file
+episode_store = catalog if catalog is not None else CatalogStore()
+crawler = None
+if catalog is not None and os.environ.get('OTAKUDESU_CRAWLER') == '1':
+    crawler = Crawler(upstream, catalog, lock_path=os.environ.get('OTAKUDESU_CRAWLER_LOCK'))
+
+# New-episode feed: polls upstream directly and primes the response cache with what it fetched.
+# Starts with the other background threads when OTAKUDESU_WATCHER=1, otherwise on the first /api/events client.
+# Under gunicorn one worker (holding OTAKUDESU_WATCHER_LOCK) polls; all of them serve events from OTAKUDESU_EVENTS_DB.
+watcher = EpisodeWatcher(
+    upstream, cache=scraper,
+    pages=int(os.environ.get('OTAKUDESU_WATCHER_PAGES', 1)),
+    interval=float(os.environ.get('OTAKUDESU_WATCHER_INTERVAL', 120)),
+    webhooks=[url.strip() for url in os.environ.get('OTAKUDESU_WEBHOOKS', '').split(',') if url.strip()],
+    log=EventLog(os.environ.get('OTAKUDESU_EVENTS_DB', ':memory:')),
+    lock_path=os.environ.get('OTAKUDESU_WATCHER_LOCK'),
+    # Each open stream holds a server thread; keep half of gunicorn's 8 per worker for pages
+    max_subscribers=int(os.environ.get('OTAKUDESU_EVENTS_MAX_STREAMS', 4)),
+    max_stream_seconds=float(os.environ.get('OTAKUDESU_EVENTS_MAX_SECONDS', 300)),
+)
+
+register_stats("response", cache.stats)
+register_stats("streams", streams.stats)
+register_stats("singleflight", scraper.flight.stats)
+register_stats("upstream", guard.stats)
+register_stats("render", render_cache.stats)
+register_stats("watcher", watcher.stats)
+if prefetcher is not None:
+    register_stats("prefetch", prefetcher.stats)
+if images is not None:
+    register_stats("images", images.stats)
+
+# Opt-in sampling profiler, e.g. OTAKUDESU_PROFILE_SAMPLE=0.01 OTAKUDESU_PROFILE_DIR=/tmp/profiles
+profile_sample = float(os.environ.get('OTAKUDESU_PROFILE_SAMPLE', 0))
+profiler = SlowRequestProfiler(profile_sample, os.environ.get('OTAKUDESU_PROFILE_DIR', 'profiles')) if profile_sample > 0 else None
+
+@app.before_request
+def start_request_timing():
+    g.request_start = time.perf_counter()
+    metrics.start_request()
+    g.profile = profiler.start() if profiler else None
+
+@app.after_request
+def record_request_timing(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    for name, seconds in metrics.end_request().items():
+        ROUTE_SECONDS.observe(seconds, route, name)
+    ROUTE_SECONDS.observe(elapsed, route, "total")
+    if g.get('profile') is not None:
+        profiler.stop(g.profile, request.path, elapsed)
+    return response
+
+def start_render_timing(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+def record_render_timing(sender, template, context, **extra):
+    start = g.pop('render_start', None)
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        RENDER_SECONDS.observe(elapsed, template.name)
+        metrics.add_phase("render", elapsed)
+
+before_render_template.connect(start_render_timing, app)
+template_rendered.connect(record_render_timing, app)
+
+def render_page(template, **context):
+    """render_template through the render cache, answering conditional requests with 304."""
+    if images is not None:
+        context = images.rewrite(context)
+    page = render_cache.get_or_render(template, context, lambda: render_template(template, **context))
+    return render_cache.respond(page, request)
+
+@app.route('/img/<signature>')
+def image(signature):
+    if images is None:
+        abort(404)
+    return images.serve(signature, request.args.get('u', ''), request.args.get('w', DEFAULT_WIDTH, type=int), request)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     data = scraper.get_home()
-    return render_template('home.html', ongoing=data['ongoing'], complete=data['complete'])
+    return render_page('home.html', ongoing=data['ongoing'], complete=data['complete'])
 
 @app.route('/ongoing')
 def ongoing():
     page = request.args.get('page', 1, type=int)
     anime_list = scraper.get_ongoing_anime(page)
-    return render_template('ongoing.html', anime_list=anime_list, page=page)
+    return render_page('ongoing.html', anime_list=anime_list, page=page)
+
+LIST_PAGE_SIZE = 100
+MAX_LIST_PAGE_SIZE = 500
+ANIME_INDEX_TTL = 300
+anime_index = {"index": AnimeListIndex(), "built_at": 0.0}
+anime_index_lock = threading.Lock()
+
+def get_anime_index():
+    """The anime-list page as a compact AnimeListIndex, rebuilt at most every ANIME_INDEX_TTL seconds."""
+    with anime_index_lock:
+        if len(anime_index["index"]) and time.time() - anime_index["built_at"] < ANIME_INDEX_TTL:
+            return anime_index["index"]
+        items = catalog.get_list('anime_list', CATALOG_MAX_AGE) if catalog else None
+        index = AnimeListIndex(items or scraper.get_anime_list())
+        if len(index):
+            anime_index.update(index=index, built_at=time.time())
+        return index
 
 @app.route('/list')
 def anime_list():
-    anime_list = scraper.get_anime_list()
-    return render_template('anime_list.html', anime_list=anime_list)
+    page = request.args.get('page', 1, type=int)
+    letter = request.args.get('letter', '')
+    index = get_anime_index()
+    entries, total = index.page(page, LIST_PAGE_SIZE, letter)
+    pages = max(1, -(-total // LIST_PAGE_SIZE))
+    return render_page('anime_list.html', anime_list=entries, page=page, pages=pages,
+                       letter=letter.upper(), letters=index.letters())
+
+@app.route('/list/all')
+def anime_list_all():
+    # Chunked response: rows are flushed as the template renders them
+    index = get_anime_index()
+    return Response(stream_template('anime_list.html', anime_list=index.entries, letters=index.letters()))
+
+@app.route('/api/list')
+def anime_list_api():
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', LIST_PAGE_SIZE, type=int), MAX_LIST_PAGE_SIZE)
+    letter = request.args.get('letter', '')
+    entries, total = get_anime_index().page(page, per_page, letter)
+    return jsonify({
+        "items": [entry.to_dict() for entry in entries],
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "letter": letter.upper() or None,
+    })
 
 @app.route('/genre')
 def genre_list():
     genres = scraper.get_genre_list()
-    return render_template('genre_list.html', genres=genres)
+    return render_page('genre_list.html', genres=genres)
+
+def search_results(query):
+    search_indexer.start()
+    results = search_indexer.index.search(query)
+    if not results:
+        results = scraper.search_anime(query)
+    return results
+
+@app.route('/genres/<slug>')
+def genre_anime(slug):
+    page = request.args.get('page', 1, type=int)
+    anime_list = get_genre_anime(slug, page)
+    return render_page('genre_anime.html', anime_list=anime_list, page=page, slug=slug,
+                       genre=slug.replace('-', ' ').title())
+
+def get_genre_anime(slug, page):
+    anime_list = scraper.get_genre_anime(slug, page)
+    for anime in anime_list:
+        genre_index.add(anime['slug'], anime['title'], url=anime['url'], genres=anime['genres'])
+    return anime_list
 
 @app.route('/search')
 def search():
     query = request.args.get('s', '')
     if not query:
-        return render_template('search_results.html', results=[], query="")
-    results = scraper.search_anime(query)
-    return render_template('search_results.html', results=results, query=query)
+        return render_page('search_results.html', results=[], query="")
+    return render_page('search_results.html', results=search_results(query), query=query)
+
+def get_anime(slug):
+    details = catalog.get_anime(slug, CATALOG_MAX_AGE) if catalog else None
+    details = details or scraper.get_anime_details(slug)
+    if details and details.get('episodes'):
+        episode_store.record_episodes(slug, details['episodes'])
+    return details
 
 @app.route('/anime/<slug>')
 def anime_detail(slug):
-    details = scraper.get_anime_details(slug)
+    details = get_anime(slug)
     if not details:
         abort(404)
-    return render_template('anime_detail.html', anime=details)
+    return render_page('anime_detail.html', anime=details)
 
 @app.route('/episode/<slug>')
 def episode_detail(slug):
     details = scraper.get_episode_details(slug)
     if not details:
         abort(404)
-    return render_template('episode.html', episode=details)
+    if prefetcher is not None:
+        prefetcher.schedule(details.get('next_episode'))
+    return render_page('episode.html', episode=details)
+
+def api_response(data, method):
+    """Scraper data as compact JSON (or msgpack), narrowed by ?fields= and cacheable for the method's TTL."""
+    if images is not None:
+        data = images.rewrite(data)
+    fields = request.args.get('fields')
+    if fields:
+        data = project(data, parse_fields(fields))
+    body, mimetype = encode(data, wants_msgpack(request))
+    response = Response(body, mimetype=mimetype)
+    ttl, stale_ttl = CachedScraper.TTLS.get(method, (0, 0))
+    response.headers['Cache-Control'] = f"public, max-age={ttl}, stale-while-revalidate={stale_ttl}"
+    response.headers['Vary'] = "Accept"
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/home')
+def home_api():
+    return api_response(scraper.get_home(), "get_home")
+
+@app.route('/api/ongoing')
+def ongoing_api():
+    page = request.args.get('page', 1, type=int)
+    return api_response(scraper.get_ongoing_anime(page), "get_ongoing_anime")
+
+@app.route('/api/genres')
+def genres_api():
+    return api_response(scraper.get_genre_list(), "get_genre_list")
+
+@app.route('/api/genres/<slug>')
+def genre_anime_api(slug):
+    page = request.args.get('page', 1, type=int)
+    return api_response(get_genre_anime(slug, page), "get_genre_anime")
+
+@app.route('/api/genre-index')
+def genre_index_api():
+    """Anime tagged with every genre in ?genres=a,b, answered from the in-memory genre index."""
+    search_indexer.start()
+    genres = [g for g in request.args.get('genres', '').split(',') if g.strip()]
+    if not genres:
+        return jsonify({"genres": [{"key": key, "name": name, "count": count}
+                                   for key, name, count in genre_index.genres()]})
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', LIST_PAGE_SIZE, type=int), MAX_LIST_PAGE_SIZE)
+    entries, total = genre_index.query(genres, page, per_page)
+    return jsonify({
+        "items": [entry.to_dict() for entry in entries],
+        "genres": genres,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "indexed": len(genre_index),
+    })
+
+@app.route('/api/search')
+def search_api():
+    query = request.args.get('q') or request.args.get('s', '')
+    if not query:
+        return jsonify({"error": "Missing query parameter q"}), 400
+    return api_response(search_results(query), "search_anime")
+
+@app.route('/api/anime/<slug>')
+def anime_api(slug):
+    details = get_anime(slug)
+    if not details:
+        return jsonify({"error": "Anime not found"}), 404
+    return api_response(details, "get_anime_details")
+
+@app.route('/api/anime/<slug>/episodes')
+def anime_episodes_api(slug):
+    """Episodes added since ?since=<version> (or ?since_time=<unix time>), oldest first."""
+    since = request.args.get('since', 0, type=int)
+    since_time = request.args.get('since_time', type=float)
+    if not get_anime(slug):
+        return jsonify({"error": "Anime not found"}), 404
+    version, fingerprint = episode_store.episode_version(slug)
+    episodes = episode_store.episodes_since(slug, since, since_time) if since < version or since_time else []
+    return jsonify({
+        "anime": slug,
+        "version": version,
+        "fingerprint": fingerprint,
+        "episodes": episodes,
+    })
+
+@app.route('/api/episode/<slug>')
+def episode_api(slug):
+    details = scraper.get_episode_details(slug)
+    if not details:
+        return jsonify({"error": "Episode not found"}), 404
+    if prefetcher is not None:
+        prefetcher.schedule(details.get('next_episode'))
+    return api_response(details, "get_episode_details")
+
+@app.route('/api/events')
+def events_api():
+    watcher.start()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscription = watcher.subscribe(last_event_id)
+    if subscription is None:
+        return jsonify({"error": "Too many event streams"}), 503, {'Retry-After': '30'}
+    response = Response(stream_with_context(watcher.stream(subscription=subscription)),
+                        mimetype='text/event-stream')
+    # Frees the slot even if the client goes away before the stream starts
+    response.call_on_close(lambda: watcher.unsubscribe(subscription))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/resolve', methods=['POST'])
 def resolve_api():
     data = request.json
-    if not data:
+    if not data or not isinstance(data, dict):
         return jsonify({"error": "No data provided"}), 400
 
+    # Batch mode: resolve every mirror of an episode in one round-trip
+    if 'mirrors' in data or 'data_contents' in data:
+        return resolve_batch(data)
+    if not all(isinstance(data[key], str) for key in ('data_content', 'url') if key in data):
+        return jsonify({"error": "data_content and url must be strings"}), 400
+
     stream_url = None
 
     # Check if we are resolving a mirror payload (from data-content)
@@ -62,15 +418,86 @@ def resolve_api():
     # Check if we are extracting from a URL (e.g. desustream iframe src)
     elif 'url' in data:
         url = data['url']
-        if "desustream" in url:
-            stream_url = scraper.extract_video_from_desustream(url)
-        else:
-            stream_url = url # Just return if we can't extract deeper
+        # Only URLs whose host has a registered extractor are fetched, and extract_streams
+        # follows iframe hops to registered hosts only
+        if find_extractor(url) is None:
+            return jsonify({"url": url}) # Just return if we can't extract deeper
+        streams = scraper.extract_streams(url)
+        if streams:
+            return jsonify({"url": streams[0]['url'], "streams": streams})
 
     if stream_url:
         return jsonify({"url": stream_url})
     return jsonify({"error": "Could not resolve stream"}), 404
 
+MAX_BATCH_RESOLVE = 64
+
+def resolve_batch(data):
+    mirrors = data.get('mirrors')
+    if mirrors is not None:
+        if not isinstance(mirrors, dict) or not all(
+                isinstance(q, list) and all(isinstance(m, dict) for m in q) for q in mirrors.values()):
+            return jsonify({"error": "mirrors must map qualities to lists of mirrors"}), 400
+        data_contents = [m.get('data_content') for q_mirrors in mirrors.values() for m in q_mirrors]
+        if not all(dc is None or isinstance(dc, str) for dc in data_contents):
+            return jsonify({"error": "data_content must be a string"}), 400
+    else:
+        data_contents = data.get('data_contents')
+        if not isinstance(data_contents, list) or not all(isinstance(dc, str) for dc in data_contents):
+            return jsonify({"error": "data_contents must be a list of strings"}), 400
+
+    if len(data_contents) > MAX_BATCH_RESOLVE:
+        return jsonify({"error": f"At most {MAX_BATCH_RESOLVE} mirrors per batch"}), 400
+
+    urls = scraper.resolve_streams(data_contents)
+    if mirrors is None:
+        return jsonify({"urls": urls})
+
+    resolved = {}
+    for quality, q_mirrors in mirrors.items():
+        resolved[quality] = [dict(m, url=urls.get(m.get('data_content'))) for m in q_mirrors]
+    return jsonify({"mirrors": resolved})
+
+def warm_start():
+    """Compiles templates and fills the caches before gunicorn forks its workers (preload_app)."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    try:
+        scraper.get_home()
+        scraper.get_ongoing_anime()
+        get_anime_index()
+    except Exception as e:
+        print(f"Error warming caches: {e}")
+
+def reopen_after_fork():
+    """Gives a forked worker its own SQLite connections, HTTP pools and event loop."""
+    cache.reopen()
+    streams.reopen()
+    if catalog is not None:
+        catalog.reopen()
+    upstream.reopen()
+    watcher.reopen()
+    if images is not None:
+        images.reopen()
+
+def seed_genre_index():
+    for slug in catalog.anime_slugs():
+        details = catalog.get_anime(slug)
+        if details:
+            genre_index.add_details(slug, details)
+
+def start_background():
+    if crawler is not None:
+        crawler.start()
+    if os.environ.get('OTAKUDESU_WATCHER') == '1':
+        watcher.start()
+    if catalog is not None:
+        threading.Thread(target=seed_genre_index, name="genre-index-seed", daemon=True).start()
+
+# Under gunicorn (gunicorn.conf.py) background threads start in each worker after fork instead
+if os.environ.get('OTAKUDESU_PRELOAD') != '1':
+    start_background()
+
 if __name__ == '__main__':
     # Disable debug mode for security in production-like environment
     app.run(debug=False, host='0.0.0.0', port=5000)
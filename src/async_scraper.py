@@ -0,0 +1,300 @@
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import phase, record_error, UPSTREAM_SECONDS, PARSE_SECONDS, UPSTREAM_RESPONSES
+from extractors import find_extractor
+from parsing import STRAINED_PAGES
+from resilience import CircuitOpenError, UpstreamGuard
+from scraper import OtakudesuScraper
+
+try:
+    import h2  # noqa: F401 -- httpx only negotiates HTTP/2 when h2 is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class AsyncOtakudesuScraper(OtakudesuScraper):
+    """asyncio variant of OtakudesuScraper sharing its parsers.
+
+    All requests go through one pooled keep-alive httpx client, and at most
+    ``per_host_limit`` requests are in flight to any single host.
+    """
+
+    def __init__(self, base_url=None, max_connections=32, per_host_limit=8, timeout=10, http2=None,
+                 strained_pages=None, guard=None):
+        if base_url:
+            self.BASE_URL = base_url.rstrip('/')
+        self.strained_pages = STRAINED_PAGES if strained_pages is None else frozenset(strained_pages)
+        self.guard = guard if guard is not None else UpstreamGuard()
+        self.per_host_limit = per_host_limit
+        self._host_semaphores = {}
+        self._nonce = None
+        self._nonce_expires = 0
+        self._nonce_lock = None
+        self._client_options = dict(
+            headers=self.HEADERS,
+            http2=HTTP2_AVAILABLE if http2 is None else http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        self.client = httpx.AsyncClient(**self._client_options)
+
+    def reopen(self):
+        """Drops the client, semaphores and locks inherited across fork(); the old loop is gone."""
+        self.client = httpx.AsyncClient(**self._client_options)
+        self._host_semaphores = {}
+        self._nonce_lock = None
+        self.guard.reopen()
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc
+        sem = self._host_semaphores.get(host)
+        if sem is None:
+            sem = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return sem
+
+    async def _request(self, method, url, check=True, expected=(), **kwargs):
+        guarded = url.startswith(self.BASE_URL)
+        attempts = 1 + (self.guard.retries if guarded and method == "GET" else 0)
+        for attempt in range(attempts):
+            if guarded:
+                wait = self.guard.before_attempt()
+            try:
+                if guarded and wait > 0:
+                    await asyncio.sleep(wait)
+                async with self._semaphore(url):
+                    start = time.perf_counter()
+                    response = await self.client.request(method, url, **kwargs)
+                    UPSTREAM_SECONDS.observe(time.perf_counter() - start, "async")
+            except httpx.TransportError as e:
+                if not guarded:
+                    raise
+                self.guard.record(error=e)
+                if attempt + 1 >= attempts:
+                    raise
+                await asyncio.sleep(self.guard.backoff(attempt))
+                continue
+            except BaseException as e:
+                # Redirect/decoding errors and cancellation still settle a half-open trial
+                if guarded:
+                    self.guard.record(error=e)
+                raise
+            UPSTREAM_RESPONSES.inc(str(response.status_code))
+            if (not guarded or not self.guard.record(status=response.status_code, expected=expected)
+                    or attempt + 1 >= attempts):
+                break
+            await asyncio.sleep(self.guard.backoff(attempt, response.headers.get('Retry-After')))
+        if check:
+            response.raise_for_status()
+        return response
+
+    async def _get_soup(self, url, page=None):
+        try:
+            response = await self._request("GET", url)
+            with phase("parse", PARSE_SECONDS, page or "other"):
+                return self.make_soup(response.content, page)
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"Error fetching {url}: {e}")
+            record_error("fetch", e)
+            return None
+
+    async def fetch_page(self, url, etag=None, last_modified=None):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = await self._request("GET", url, check=False, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+            return (response.status_code, response.content,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"Error fetching {url}: {e}")
+            record_error("fetch", e)
+            return None
+
+    async def get_home(self):
+        soup = await self._get_soup(self.BASE_URL + "/", "home")
+        if not soup:
+            return {"ongoing": [], "complete": []}
+        return self.parse_home(soup)
+
+    async def get_ongoing_anime(self, page=1):
+        soup = await self._get_soup(self.ongoing_url(page), "ongoing")
+        if not soup:
+            return []
+        return self.parse_ongoing(soup)
+
+    async def get_anime_list(self):
+        soup = await self._get_soup(f"{self.BASE_URL}/anime-list/", "anime_list")
+        if not soup:
+            return []
+        return self.parse_anime_list(soup)
+
+    async def get_genre_list(self):
+        soup = await self._get_soup(f"{self.BASE_URL}/genre-list/", "genre_list")
+        if not soup:
+            return []
+        return self.parse_genre_list(soup)
+
+    async def get_genre_anime(self, slug, page=1):
+        soup = await self._get_soup(self.genre_url(slug, page), "genre")
+        if not soup:
+            return []
+        return self.parse_genre_page(soup)
+
+    async def search_anime(self, query):
+        soup = await self._get_soup(self.search_url(query), "search")
+        if not soup:
+            return []
+        return self.parse_search(soup)
+
+    async def get_anime_details(self, slug):
+        soup = await self._get_soup(f"{self.BASE_URL}/anime/{slug}/", "anime_details")
+        if not soup:
+            return None
+        return self.parse_anime_details(soup, slug)
+
+    async def get_episode_details(self, slug):
+        soup = await self._get_soup(f"{self.BASE_URL}/episode/{slug}/", "episode_details")
+        if not soup:
+            return None
+        return self.parse_episode_details(soup, slug)
+
+    async def _get_nonce(self, rejected=None):
+        """The cached nonce, fetching a new one when it has expired or is the ``rejected`` one."""
+        if self._nonce_lock is None:
+            self._nonce_lock = asyncio.Lock()
+        async with self._nonce_lock:
+            # Concurrent resolves rejected with the same nonce share the one refresh
+            if self._nonce and self._nonce != rejected and time.time() < self._nonce_expires:
+                return self._nonce
+            try:
+                res = await self._request("POST", self.BASE_URL + self.AJAX_PATH, data={"action": self.NONCE_ACTION})
+                nonce = res.json().get('data')
+            except Exception as e:
+                print(f"Error getting nonce: {e}")
+                record_error("nonce", e)
+                return None
+            self.store_nonce(nonce)
+            return nonce
+
+    async def resolve_stream(self, data_content):
+        nonce = await self._get_nonce()
+        if not nonce:
+            return None
+
+        try:
+            rejected, embed_data = await self._post_embed(data_content, nonce)
+            if rejected:
+                nonce = await self._get_nonce(rejected=nonce)
+                if not nonce:
+                    return None
+                rejected, embed_data = await self._post_embed(data_content, nonce)
+            return self.parse_embed(embed_data)
+        except Exception as e:
+            print(f"Error resolving stream: {e}")
+            record_error("resolve_stream", e)
+            return None
+
+    async def _post_embed(self, data_content, nonce):
+        res = await self._request(
+            "POST", self.BASE_URL + self.AJAX_PATH, check=False, expected=self.NONCE_REJECTED_STATUSES,
+            data=self.build_embed_payload(data_content, nonce),
+        )
+        return self.read_embed_response(res)
+
+    async def resolve_streams(self, data_contents, max_workers=8):
+        unique = list(dict.fromkeys(dc for dc in data_contents if dc))
+        sem = asyncio.Semaphore(max_workers)
+
+        async def resolve(dc):
+            async with sem:
+                return await self.resolve_stream(dc)
+
+        urls = await asyncio.gather(*(resolve(dc) for dc in unique))
+        return dict(zip(unique, urls))
+
+    async def extract_streams(self, url):
+        try:
+            for _ in range(self.MAX_EXTRACT_HOPS):
+                # Hops only go to registered hosts, so an embed cannot point the scraper anywhere else
+                extractor = find_extractor(url)
+                if extractor is None:
+                    return []
+                streams = extractor.direct(url)
+                if streams is not None:
+                    return streams
+                response = await self._request("GET", url)
+                with phase("parse", PARSE_SECONDS, extractor.name):
+                    streams, url = extractor.extract(response.content, url)
+                if streams or not url:
+                    return streams
+            return []
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"Error extracting streams from {url}: {e}")
+            record_error("extract", e)
+            return []
+
+    async def extract_video_from_desustream(self, url):
+        streams = await self.extract_streams(url)
+        return streams[0]['url'] if streams else None
+
+    async def extract_video_from_blogger(self, url):
+        streams = await self.extract_streams(url)
+        return streams[0]['url'] if streams else None
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class BlockingScraper:
+    """Synchronous facade over an AsyncOtakudesuScraper for WSGI views.
+
+    Flask's own ``async def`` views start a fresh event loop per request, which
+    would throw away the connection pool every time. Instead one background
+    loop owns the async scraper and every worker thread submits to it.
+    """
+
+    def __init__(self, async_scraper=None, **kwargs):
+        self._start_loop()
+        self.async_scraper = async_scraper or AsyncOtakudesuScraper(**kwargs)
+
+    def _start_loop(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="scraper-loop", daemon=True)
+        self._thread.start()
+
+    def reopen(self):
+        """A forked child inherits the loop but not the thread running it; start a new one."""
+        self._start_loop()
+        self.async_scraper.reopen()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def __getattr__(self, name):
+        attr = getattr(self.async_scraper, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        # wraps() keeps the coroutine's signature visible, e.g. for CachedScraper's keys
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            return self.run(attr(*args, **kwargs))
+
+        return call
+
+    def close(self):
+        self.run(self.async_scraper.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,364 @@
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import phase, SCRAPER_SECONDS
+from singleflight import SingleFlight
+from scraper import resolve_all
+from stream_cache import StreamCache
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "stale_until", "size")
+
+    def __init__(self, value, expires_at, stale_until, size=None):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size if size is not None else len(json.dumps(value))
+
+    def is_fresh(self, now):
+        return now < self.expires_at
+
+    def is_usable(self, now):
+        return now < self.stale_until
+
+
+class LRUCache:
+    """In-process LRU bounded by the JSON-encoded size of its values."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.size
+            self._data[key] = entry
+            self.current_bytes += entry.size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.current_bytes -= evicted.size
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk tier shared by every worker process pointing at the same file.
+
+    Every ``purge_every`` writes, rows more than ``keep_stale`` seconds past
+    their stale window are dropped (younger ones still back stale-if-error),
+    then the soonest-expiring rows beyond ``max_entries``.
+    """
+
+    def __init__(self, path, max_entries=50000, keep_stale=24 * 3600, purge_every=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.keep_stale = keep_stale
+        self.purge_every = purge_every
+        self.purged = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at, stale_until FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading cache {self.path}: {e}")
+            return None
+        if not row:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2], size=len(row[0]))
+
+    def set(self, key, entry):
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry.value), entry.expires_at, entry.stale_until),
+            )
+        except sqlite3.Error as e:
+            print(f"Error writing cache {self.path}: {e}")
+            return
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def reopen(self):
+        """Drops connections inherited across fork(); each thread reconnects lazily."""
+        self._local = threading.local()
+
+    def purge(self, now=None):
+        now = now if now is not None else time.time()
+        try:
+            conn = self._conn()
+            removed = conn.execute("DELETE FROM cache WHERE stale_until <= ?", (now - self.keep_stale,)).rowcount
+            removed += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        except sqlite3.Error as e:
+            print(f"Error purging cache {self.path}: {e}")
+            return 0
+        self.purged += removed
+        return removed
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+
+def is_cacheable(value):
+    # Scraper methods signal upstream failures with None, [] or a dict of empty lists.
+    if not value:
+        return False
+    if isinstance(value, dict) and not any(value.values()):
+        return False
+    return True
+
+
+class ResponseCache:
+    """Memory tier in front of an optional shared disk tier, with stale-while-revalidate.
+
+    Entries past their stale window are kept until evicted, so when a fetch
+    fails (or the upstream circuit breaker is open) the last good value is
+    served instead of the failure.
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self.hits = 0
+        self.stale_hits = 0
+        self.stale_errors = 0
+        self.misses = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, now):
+        entry = self.memory.get(key)
+        if self.disk is not None and (entry is None or not entry.is_fresh(now)):
+            # Another worker may already have refreshed a stale entry on disk
+            stored = self.disk.get(key)
+            if stored is not None and (entry is None or stored.expires_at > entry.expires_at):
+                entry = stored
+                self.memory.set(key, entry)
+        return entry
+
+    def _store(self, key, value, ttl, stale_ttl):
+        now = time.time()
+        entry = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def get_or_fetch(self, key, fetch, ttl, stale_ttl=0):
+        now = time.time()
+        entry = self._lookup(key, now)
+        if entry is not None and entry.is_fresh(now):
+            self.hits += 1
+            return entry.value
+        if entry is not None and entry.is_usable(now):
+            self.stale_hits += 1
+            self._refresh_in_background(key, fetch, ttl, stale_ttl)
+            return entry.value
+
+        self.misses += 1
+        value = fetch()
+        if is_cacheable(value):
+            self._store(key, value, ttl, stale_ttl)
+        elif entry is not None:
+            self.stale_errors += 1
+            return entry.value
+        return value
+
+    def put(self, key, value, ttl, stale_ttl=0):
+        if is_cacheable(value):
+            self._store(key, value, ttl, stale_ttl)
+
+    def _refresh_in_background(self, key, fetch, ttl, stale_ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if is_cacheable(value):
+                    self._store(key, value, ttl, stale_ttl)
+            except Exception as e:
+                print(f"Error refreshing cache entry {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def reopen(self):
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if self.disk is not None:
+            self.disk.reopen()
+
+    def invalidate(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "stale_errors": self.stale_errors,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "evictions": self.memory.evictions,
+            "entries": len(self.memory),
+            "bytes": self.memory.current_bytes,
+        }
+
+
+class CachedScraper:
+    """Wraps an OtakudesuScraper so its page methods are answered from a ResponseCache.
+
+    Cache misses and the stream resolvers go through a SingleFlight, so
+    concurrent identical calls share one upstream fetch and parse. Resolved
+    stream URLs are kept in a StreamCache until they expire.
+    """
+
+    # method name -> (ttl, stale-while-revalidate window), in seconds
+    TTLS = {
+        "get_home": (300, 900),
+        "get_ongoing_anime": (300, 900),
+        "get_anime_list": (6 * 3600, 24 * 3600),
+        "get_genre_list": (12 * 3600, 24 * 3600),
+        "get_genre_anime": (1800, 6 * 3600),
+        "search_anime": (900, 900),
+        "get_anime_details": (1800, 6 * 3600),
+        "get_episode_details": (3600, 6 * 3600),
+    }
+    COALESCED = ("resolve_stream", "extract_streams", "extract_video_from_desustream", "extract_video_from_blogger")
+
+    def __init__(self, scraper, cache=None, ttls=None, flight=None, streams=None):
+        self.scraper = scraper
+        self.cache = cache if cache is not None else ResponseCache()
+        self.streams = streams if streams is not None else StreamCache()
+        self.flight = flight if flight is not None else SingleFlight()
+        self.ttls = dict(self.TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._signatures = {}
+
+    def resolve_streams(self, data_contents, max_workers=8):
+        return resolve_all(self.resolve_stream, data_contents, max_workers)
+
+    @staticmethod
+    def _timed(name, method):
+        def call(*args, **kwargs):
+            with phase(None, SCRAPER_SECONDS, name):
+                return method(*args, **kwargs)
+
+        return call
+
+    def prime(self, name, value, *args):
+        """Caches ``value`` as the result of ``name(*args)``, e.g. after a watcher fetched it."""
+        if name in self.ttls:
+            ttl, stale_ttl = self.ttls[name]
+            self.cache.put(self.make_key(name, args, {}), value, ttl, stale_ttl)
+
+    def make_key(self, name, args, kwargs):
+        """Cache key of ``name(*args, **kwargs)``, with defaults filled in so f() and f(1) share one."""
+        signature = self._signatures.get(name)
+        if signature is None:
+            try:
+                signature = inspect.signature(getattr(self.scraper, name))
+            except (TypeError, ValueError):
+                signature = False
+            self._signatures[name] = signature
+        if signature:
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                pass
+            else:
+                bound.apply_defaults()
+                args, kwargs = bound.args, bound.kwargs
+        return f"{name}:{json.dumps([args, kwargs], sort_keys=True)}"
+
+    def __getattr__(self, name):
+        method = getattr(self.scraper, name)
+        if name in self.ttls or name in self.COALESCED:
+            method = self._timed(name, method)
+        if name in self.ttls:
+            ttl, stale_ttl = self.ttls[name]
+
+            def cached(*args, **kwargs):
+                key = self.make_key(name, args, kwargs)
+                fetch = lambda: self.flight.do(key, lambda: method(*args, **kwargs))
+                return self.cache.get_or_fetch(key, fetch, ttl, stale_ttl)
+
+            return cached
+
+        if name in self.COALESCED:
+            def resolved(*args, **kwargs):
+                key = self.make_key(name, args, kwargs)
+                url = self.streams.get(key)
+                if url:
+                    return url
+                url = self.flight.do(key, lambda: method(*args, **kwargs))
+                if url:
+                    self.streams.set(key, url)
+                return url
+
+            return resolved
+
+        return method
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def episode_fingerprint(episodes):
+    """Digest of an anime's episode slugs; equal fingerprints mean no episode was added or removed."""
+    return hashlib.sha1("\n".join(ep['slug'] for ep in episodes).encode("utf-8")).hexdigest()
+
+
+class CatalogStore:
+    """Local SQLite copy of the catalog kept warm by the Crawler.
+
+    Holds parsed anime details and page lists (anime-list, ongoing pages)
+    plus the validators (ETag, Last-Modified, content hash) of every page
+    the crawler has fetched, so unchanged pages can be skipped.
+
+    Episodes are also logged per anime with the version in which they first
+    appeared, so callers can ask for only the episodes added since a
+    version (or time) they already have.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, fetched_at REAL);"
+            "CREATE TABLE IF NOT EXISTS anime ("
+            " slug TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS lists ("
+            " name TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS episode_versions ("
+            " anime TEXT PRIMARY KEY, version INTEGER NOT NULL, fingerprint TEXT NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS episodes ("
+            " anime TEXT NOT NULL, slug TEXT NOT NULL, data TEXT NOT NULL,"
+            " version INTEGER NOT NULL, added_at REAL NOT NULL, PRIMARY KEY (anime, slug));"
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def reopen(self):
+        """Replaces a connection inherited across fork(); in-memory stores keep theirs."""
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            self._conn = self._connect()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def get_page_meta(self, url):
+        rows = self._execute("SELECT etag, last_modified, content_hash FROM pages WHERE url = ?", (url,))
+        if not rows:
+            return None
+        etag, last_modified, content_hash = rows[0]
+        return {"etag": etag, "last_modified": last_modified, "content_hash": content_hash}
+
+    def save_page_meta(self, url, etag, last_modified, content_hash):
+        self._execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, content_hash, time.time()),
+        )
+
+    def _get(self, table, key_column, key, max_age):
+        rows = self._execute(f"SELECT data, updated_at FROM {table} WHERE {key_column} = ?", (key,))
+        if not rows:
+            return None
+        data, updated_at = rows[0]
+        if max_age is not None and time.time() - updated_at > max_age:
+            return None
+        return json.loads(data)
+
+    def get_anime(self, slug, max_age=None):
+        return self._get("anime", "slug", slug, max_age)
+
+    def put_anime(self, slug, details):
+        self._execute(
+            "INSERT OR REPLACE INTO anime (slug, data, updated_at) VALUES (?, ?, ?)",
+            (slug, json.dumps(details), time.time()),
+        )
+
+    def get_list(self, name, max_age=None):
+        return self._get("lists", "name", name, max_age)
+
+    def put_list(self, name, items):
+        self._execute(
+            "INSERT OR REPLACE INTO lists (name, data, updated_at) VALUES (?, ?, ?)",
+            (name, json.dumps(items), time.time()),
+        )
+
+    def touch_anime(self, slug):
+        """Marks stored details as current without rewriting them (the page was unchanged)."""
+        self._execute("UPDATE anime SET updated_at = ? WHERE slug = ?", (time.time(), slug))
+
+    def touch_list(self, name):
+        self._execute("UPDATE lists SET updated_at = ? WHERE name = ?", (time.time(), name))
+
+    def stale_anime_slugs(self, max_age, limit):
+        """Up to ``limit`` slugs whose details were last confirmed more than ``max_age`` seconds ago, oldest first."""
+        return [row[0] for row in self._execute(
+            "SELECT slug FROM anime WHERE updated_at < ? ORDER BY updated_at LIMIT ?", (time.time() - max_age, limit))]
+
+    def anime_slugs(self):
+        return [row[0] for row in self._execute("SELECT slug FROM anime")]
+
+    def episode_version(self, anime):
+        """Returns (version, fingerprint) of the episodes last recorded for ``anime``, or (0, None)."""
+        rows = self._execute("SELECT version, fingerprint FROM episode_versions WHERE anime = ?", (anime,))
+        return rows[0] if rows else (0, None)
+
+    def record_episodes(self, anime, episodes):
+        """Logs episodes not seen before under a new version; returns (version, fingerprint, added)."""
+        fingerprint = episode_fingerprint(episodes)
+        version, known_fingerprint = self.episode_version(anime)
+        if fingerprint == known_fingerprint:
+            return version, fingerprint, []
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read under the write lock: another worker may have recorded this list since the check above
+                row = conn.execute(
+                    "SELECT version, fingerprint FROM episode_versions WHERE anime = ?", (anime,)).fetchone()
+                if row and row[1] == fingerprint:
+                    conn.execute("COMMIT")
+                    return row[0], fingerprint, []
+                version = (row[0] if row else 0) + 1
+                known = {slug for (slug,) in conn.execute("SELECT slug FROM episodes WHERE anime = ?", (anime,))}
+                # Upstream lists newest first; log the oldest new episode first so rowid order is airing order
+                added = [ep for ep in reversed(episodes) if ep['slug'] not in known]
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR IGNORE INTO episodes (anime, slug, data, version, added_at) VALUES (?, ?, ?, ?, ?)",
+                    [(anime, ep['slug'], json.dumps(ep), version, now) for ep in added],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO episode_versions (anime, version, fingerprint, updated_at) VALUES (?, ?, ?, ?)",
+                    (anime, version, fingerprint, now),
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        return version, fingerprint, added
+
+    def episodes_since(self, anime, version=0, since=None):
+        """Episodes first seen after ``version`` (or after the ``since`` timestamp), oldest first."""
+        if since is not None:
+            rows = self._execute(
+                "SELECT data FROM episodes WHERE anime = ? AND added_at > ? ORDER BY rowid", (anime, since))
+        else:
+            rows = self._execute(
+                "SELECT data FROM episodes WHERE anime = ? AND version > ? ORDER BY rowid", (anime, version))
+        return [json.loads(data) for (data,) in rows]
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; every process leads
+    fcntl = None
+
+
+class LeaderLock:
+    """Exclusive non-blocking flock on ``path``; the first process to take it keeps it until it exits.
+
+    Lets one of several forked workers run a background job while the others
+    keep checking, so a successor takes over when the leader dies.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if self.path is None or fcntl is None or self._file is not None:
+            return True
+        lock_file = open(self.path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+
+class Crawler:
+    """Keeps a CatalogStore warm from the scraper in a background thread.
+
+    Each pass re-fetches the anime list and the first ``ongoing_pages``
+    ongoing pages with conditional requests, skips anything answered with
+    304 or whose body hashes the same as last time, and re-crawls
+    get_anime_details only for titles whose latest episode changed (or that
+    are not in the store yet). Pages confirmed unchanged keep their stored
+    copy current, and up to ``refresh_batch`` stored titles older than
+    ``refresh_after`` (completed titles that left the ongoing pages) are
+    re-checked each pass. All requests share one rate budget.
+
+    With a ``lock_path``, only the process holding an exclusive lock on that
+    file crawls, so forked workers sharing one store do not crawl N times.
+    """
+
+    def __init__(self, scraper, store, ongoing_pages=3, interval=900, max_requests_per_minute=30,
+                 lock_path=None, refresh_after=12 * 3600, refresh_batch=20):
+        self.scraper = scraper
+        self.store = store
+        self.ongoing_pages = ongoing_pages
+        self.refresh_after = refresh_after
+        self.refresh_batch = refresh_batch
+        self.interval = interval
+        self.min_request_interval = 60.0 / max_requests_per_minute
+        self.stats = {"fetched": 0, "not_modified": 0, "unchanged": 0, "errors": 0}
+        self.lock_path = lock_path
+        self.leader = LeaderLock(lock_path)
+        self._last_request = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _throttle(self):
+        wait = self._last_request + self.min_request_interval - time.monotonic()
+        if wait > 0:
+            self._stop.wait(wait)
+        self._last_request = time.monotonic()
+
+    def _fetch(self, url, touch=None):
+        """Returns the page body if it changed since the last crawl, else None.
+
+        ``touch`` is called when the page is confirmed unchanged, to mark what
+        was parsed from it as still current.
+        """
+        self._throttle()
+        meta = self.store.get_page_meta(url) or {}
+        result = self.scraper.fetch_page(url, meta.get("etag"), meta.get("last_modified"))
+        if result is None:
+            self.stats["errors"] += 1
+            return None
+        status, content, etag, last_modified = result
+        if status == 304:
+            self.stats["not_modified"] += 1
+            if touch:
+                touch()
+            return None
+
+        content_hash = hashlib.sha1(content).hexdigest()
+        self.store.save_page_meta(url, etag, last_modified, content_hash)
+        if content_hash == meta.get("content_hash"):
+            self.stats["unchanged"] += 1
+            if touch:
+                touch()
+            return None
+        self.stats["fetched"] += 1
+        return content
+
+    def crawl_anime_list(self):
+        content = self._fetch(f"{self.scraper.BASE_URL}/anime-list/", lambda: self.store.touch_list("anime_list"))
+        if content is None:
+            return
+        anime_list = self.scraper.parse_anime_list(self.scraper.make_soup(content, "anime_list"))
+        if anime_list:
+            self.store.put_list("anime_list", anime_list)
+
+    def crawl_ongoing(self):
+        """Returns the slugs whose latest episode changed on the ongoing pages."""
+        changed = set()
+        for page in range(1, self.ongoing_pages + 1):
+            name = f"ongoing:{page}"
+            content = self._fetch(self.scraper.ongoing_url(page), lambda: self.store.touch_list(name))
+            if content is None:
+                continue
+            anime_list = self.scraper.parse_ongoing(self.scraper.make_soup(content, "ongoing"))
+            if not anime_list:
+                continue
+            previous = {(a['slug'], a['episode']) for a in self.store.get_list(name) or []}
+            changed.update(a['slug'] for a in anime_list if (a['slug'], a['episode']) not in previous)
+            self.store.put_list(name, anime_list)
+        return changed
+
+    def crawl_details(self, slug):
+        content = self._fetch(f"{self.scraper.BASE_URL}/anime/{slug}/", lambda: self.store.touch_anime(slug))
+        if content is None:
+            return
+        details = self.scraper.parse_anime_details(self.scraper.make_soup(content, "anime_details"), slug)
+        if details:
+            self.store.put_anime(slug, details)
+            self.store.record_episodes(slug, details.get('episodes', []))
+
+    def crawl_once(self):
+        self.crawl_anime_list()
+        slugs = self.crawl_ongoing()
+        known = set(self.store.anime_slugs())
+        for page in range(1, self.ongoing_pages + 1):
+            slugs.update(a['slug'] for a in self.store.get_list(f"ongoing:{page}") or [] if a['slug'] not in known)
+        slugs.update(self.store.stale_anime_slugs(self.refresh_after, self.refresh_batch))
+        for slug in sorted(slugs):
+            if self._stop.is_set():
+                break
+            self.crawl_details(slug)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="catalog-crawler", daemon=True)
+            self._thread.start()
+
+    def is_leader(self):
+        return self.leader.acquire()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader():
+                    self.crawl_once()
+            except Exception as e:
+                print(f"Error crawling catalog: {e}")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,180 @@
+"""Stream extractors for the hosts that episode mirrors embed.
+
+Each extractor scans the raw bytes of a host page with precompiled patterns
+instead of building a soup, and returns every stream it finds as
+{"url", "quality", "host"} dicts, best quality first. Wrapper pages (the
+desustream player framing a blogger video) return the next URL to follow
+instead. Extractors claim URLs by hostname; register extra hosts by
+appending to EXTRACTORS. URLs no extractor claims are never fetched.
+"""
+import html
+import json
+import posixpath
+import re
+from urllib.parse import urlsplit
+
+IFRAME_SRC = re.compile(rb"""<iframe\b[^>]*?\bsrc\s*=\s*["']([^"']+)["']""", re.I)
+VIDEO_CONFIG = re.compile(rb"VIDEO_CONFIG\s*=\s*(?={)")
+SOURCE_TAG = re.compile(rb"<source\b([^>]*)>", re.I)
+TAG_ATTR = re.compile(rb"""\b(src|size|label|res)\s*=\s*["']([^"']*)["']""", re.I)
+# jwplayer / videojs style {file: "...", label: "720p"} source lists
+JS_SOURCE = re.compile(
+    rb"""["']?file["']?\s*:\s*["']([^"']+)["']"""
+    rb"""(?:\s*,\s*["']?(?:label|res)["']?\s*:\s*["']?([^"',}]+))?"""
+)
+MEDIA_URL = re.compile(rb"""https?://[^\s"'<>\\]+?\.(?:mp4|m3u8|webm)(?:\?[^\s"'<>\\]*)?(?=["'\s<\\])""")
+QUALITY = re.compile(r"(\d{3,4})\s*p?", re.I)
+
+# googlevideo itag -> quality, for blogger's VIDEO_CONFIG streams
+ITAG_QUALITIES = {37: "1080p", 22: "720p", 59: "480p", 18: "360p"}
+
+
+def normalize_quality(label):
+    match = QUALITY.search(label or "")
+    return f"{match.group(1)}p" if match else ""
+
+
+def quality_rank(quality):
+    match = QUALITY.search(quality or "")
+    return int(match.group(1)) if match else 0
+
+
+def make_streams(host, pairs):
+    """Deduplicates (url, quality) pairs into stream dicts, best quality first."""
+    streams = {}
+    for url, quality in pairs:
+        url = html.unescape(url)
+        if url.startswith("//"):
+            url = "https:" + url
+        if url.startswith("http") and url not in streams:
+            streams[url] = {"url": url, "quality": quality, "host": host}
+    return sorted(streams.values(), key=lambda stream: quality_rank(stream["quality"]), reverse=True)
+
+
+def decode(match):
+    return match.decode("utf-8", "replace")
+
+
+def url_host(url):
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return ""
+    if parts.scheme not in ("http", "https"):
+        return ""
+    return (parts.hostname or "").lower()
+
+
+class Extractor:
+    """Base extractor: scans for <source> tags, player source lists and bare media URLs, else an iframe."""
+    name = "generic"
+    # Domains served by this extractor, subdomains included
+    hosts = ()
+
+    def matches(self, url):
+        host = url_host(url)
+        return any(host == domain or host.endswith("." + domain) for domain in self.hosts)
+
+    def direct(self, url):
+        """Streams derivable from the URL alone, without fetching it."""
+        return None
+
+    def extract(self, body, url):
+        """Returns (streams, next_url) for the raw page ``body`` fetched from ``url``."""
+        streams = self.scan_sources(body)
+        if streams:
+            return streams, None
+        iframe = IFRAME_SRC.search(body)
+        return [], html.unescape(decode(iframe.group(1))) if iframe else None
+
+    def scan_sources(self, body):
+        pairs = []
+        for match in SOURCE_TAG.finditer(body):
+            attrs = {decode(name).lower(): decode(value) for name, value in TAG_ATTR.findall(match.group(1))}
+            if attrs.get("src"):
+                label = attrs.get("label") or attrs.get("size") or attrs.get("res")
+                pairs.append((attrs["src"], normalize_quality(label)))
+        for match in JS_SOURCE.finditer(body):
+            pairs.append((decode(match.group(1)), normalize_quality(decode(match.group(2) or b""))))
+        if not pairs:
+            pairs = [(decode(url), normalize_quality(decode(url))) for url in MEDIA_URL.findall(body)]
+        return make_streams(self.name, pairs)
+
+
+class DesustreamExtractor(Extractor):
+    """desustream.info players (the ondesuhd, odstream and desudrive mirrors); usually frame a blogger video."""
+    name = "desustream"
+    hosts = ("desustream.info", "desustream.com", "desustream.me")
+
+
+class BloggerExtractor(Extractor):
+    name = "blogger"
+    hosts = ("blogger.com",)
+
+    def extract(self, body, url):
+        match = VIDEO_CONFIG.search(body)
+        if not match:
+            print("VIDEO_CONFIG not found in blogger page")
+            return [], None
+        try:
+            # raw_decode stops at the end of the object, so no lazy regex has to find the closing brace
+            config, _ = json.JSONDecoder().raw_decode(body[match.end():].decode("utf-8", "replace"))
+        except ValueError:
+            print("Error decoding VIDEO_CONFIG JSON")
+            return [], None
+        pairs = [(stream["play_url"], ITAG_QUALITIES.get(stream.get("format_id"), ""))
+                 for stream in config.get("streams") or () if stream.get("play_url")]
+        return make_streams(self.name, pairs), None
+
+
+class PixeldrainExtractor(Extractor):
+    """pixeldrain.com (the pdrain mirror): the file id in the share URL maps straight to its download URL."""
+    name = "pixeldrain"
+    hosts = ("pixeldrain.com",)
+    FILE_PATH = re.compile(r"^/(?:u|api/file)/([A-Za-z0-9]+)")
+
+    def direct(self, url):
+        match = self.FILE_PATH.match(urlsplit(url).path)
+        if not match:
+            return []
+        return make_streams(self.name, [(f"https://pixeldrain.com/api/file/{match.group(1)}", "")])
+
+
+EXTRACTORS = [DesustreamExtractor(), BloggerExtractor(), PixeldrainExtractor()]
+
+# "http://host:port/path/" prefix -> extractor name, for a stand-in origin
+# (bench/origin.py) serving a host's pages under its own address
+ALIASES = {}
+
+
+def parse_aliases(spec):
+    """Turns "desustream=http://127.0.0.1:8081/_ext/desustream/,..." into an ALIASES dict."""
+    aliases = {}
+    for item in spec.split(","):
+        name, _, prefix = item.strip().partition("=")
+        if name and prefix:
+            aliases[prefix.strip()] = name.strip()
+    return aliases
+
+
+def alias_for(url):
+    if not ALIASES or not url_host(url):
+        return None
+    parts = urlsplit(url)
+    # Normalised so "/_ext/desustream/../../admin" does not pass as a desustream page
+    path = posixpath.normpath(parts.path or "/")
+    for prefix, name in ALIASES.items():
+        alias = urlsplit(prefix)
+        if ((parts.scheme, parts.netloc) == (alias.scheme, alias.netloc)
+                and (path + "/").startswith(alias.path.rstrip("/") + "/")):
+            return name
+    return None
+
+
+def find_extractor(url):
+    """The extractor registered for ``url``'s host (or an alias prefix of it), or None."""
+    name = alias_for(url)
+    for extractor in EXTRACTORS:
+        if extractor.name == name if name else extractor.matches(url):
+            return extractor
+    return None
@@ -0,0 +1,80 @@
+import re
+import threading
+
+from anime_index import AnimeEntry
+from search_index import split_genres
+
+
+def genre_key(name):
+    """Normalises "Slice of Life" and "slice-of-life" to the same key."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class GenreIndex:
+    """In-memory genre -> anime inverted index for multi-genre browsing.
+
+    Each anime gets a dense integer id, and each genre keeps its member ids
+    as the bits of one Python int, so a multi-genre query is one AND per
+    genre followed by a walk over the set bits of the result.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._ids = {}
+        self._genres = {}
+        self._bits = {}
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, slug, title, url="", genres=()):
+        keys = {genre_key(name): name for name in split_genres(genres) if genre_key(name)}
+        with self._lock:
+            anime_id = self._ids.get(slug)
+            if anime_id is None:
+                anime_id = self._ids[slug] = len(self.entries)
+                self.entries.append(AnimeEntry(title, slug, url))
+            else:
+                entry = self.entries[anime_id]
+                entry.title = title or entry.title
+                entry.url = url or entry.url
+            bit = 1 << anime_id
+            for key in self._genres.get(slug, ()):
+                if key not in keys:
+                    self._bits[key] &= ~bit
+            for key, name in keys.items():
+                self._bits[key] = self._bits.get(key, 0) | bit
+                self._names.setdefault(key, name)
+            self._genres[slug] = tuple(keys)
+
+    def add_details(self, slug, details, url=""):
+        """Indexes the genres returned by OtakudesuScraper.get_anime_details."""
+        self.add(slug, details.get("title") or slug, url=url, genres=details.get("genre", ()))
+
+    def genres(self):
+        """(key, display name, count) for every genre with at least one anime."""
+        with self._lock:
+            counts = [(key, self._names[key], bits.bit_count()) for key, bits in self._bits.items() if bits]
+        return sorted(counts, key=lambda genre: genre[1].lower())
+
+    def query(self, genres, page=1, per_page=50):
+        """Returns (entries, total) for anime tagged with every one of ``genres``, in title order."""
+        keys = [genre_key(name) for name in genres if genre_key(name)]
+        if not keys:
+            return [], 0
+        with self._lock:
+            bits = -1
+            for key in sorted(keys, key=lambda k: self._bits.get(k, 0).bit_count()):
+                bits &= self._bits.get(key, 0)
+                if not bits:
+                    return [], 0
+            matches = []
+            while bits:
+                low = bits & -bits
+                matches.append(self.entries[low.bit_length() - 1])
+                bits ^= low
+        matches.sort(key=lambda entry: entry.title.lower())
+        start = (max(page, 1) - 1) * per_page
+        return matches[start:start + per_page], len(matches)
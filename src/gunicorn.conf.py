@@ -0,0 +1,43 @@
+"""Production server settings, run from src/ with: gunicorn -c gunicorn.conf.py app:app
+
+The master imports the app and warms its caches once (preload_app), then
+forks the workers, which share the response, stream and catalog caches and
+the upstream rate budget through SQLite files in OTAKUDESU_STATE_DIR.
+"""
+import multiprocessing
+import os
+
+state_dir = os.environ.setdefault('OTAKUDESU_STATE_DIR', '/tmp/otakudesu')
+os.makedirs(state_dir, exist_ok=True)
+for name, filename in (('OTAKUDESU_CACHE_DB', 'cache.db'),
+                       ('OTAKUDESU_STREAM_CACHE', 'streams.db'),
+                       ('OTAKUDESU_CATALOG_DB', 'catalog.db'),
+                       ('OTAKUDESU_RATE_DB', 'rate.db'),
+                       ('OTAKUDESU_CRAWLER_LOCK', 'crawler.lock'),
+                       ('OTAKUDESU_EVENTS_DB', 'events.db'),
+                       ('OTAKUDESU_WATCHER_LOCK', 'watcher.lock'),
+                       ('OTAKUDESU_IMAGE_DIR', 'images')):
+    os.environ.setdefault(name, os.path.join(state_dir, filename))
+os.environ['OTAKUDESU_PRELOAD'] = '1'
+
+bind = os.environ.get('BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# Views block on upstream I/O, so each worker serves several requests on threads.
+# An open /api/events stream holds one of these threads; OTAKUDESU_EVENTS_MAX_STREAMS caps them per worker.
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 60
+keepalive = 5
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    import app
+    app.warm_start()
+
+
+def post_fork(server, worker):
+    import app
+    app.reopen_after_fork()
+    app.start_background()
@@ -0,0 +1,202 @@
+import hashlib
+import hmac
+import io
+import os
+import secrets
+import threading
+from urllib.parse import quote
+
+import requests
+from flask import abort, send_file
+
+from singleflight import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+WIDTHS = (160, 320, 640)
+DEFAULT_WIDTH = 320
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+ORIGINAL_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
+
+
+class DiskLRU:
+    """Files in one directory, evicted least recently used first once they exceed ``max_bytes``.
+
+    Recency is the file mtime, bumped on every hit. The size is taken from
+    the directory itself after every write, so gunicorn workers sharing it
+    keep the directory as a whole under ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.evict()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        """Path of a cached file, or None."""
+        path = self.path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set(self, name, data):
+        path = self.path(name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict(keep=name)
+        return path
+
+    def _scan(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another worker mid-scan
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Removes the least recently used files until the directory fits in ``max_bytes``."""
+        with self._lock:
+            entries = self._scan()
+            size = sum(entry[2] for entry in entries)
+            for _, name, file_size in entries:
+                if size <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(self.path(name))
+                    self.evictions += 1
+                except FileNotFoundError:
+                    pass
+                # Gone either way; another worker may have removed it first
+                size -= file_size
+            self.size = size
+
+
+class ImageProxy:
+    """Fetches cover images once and serves resized copies from a disk cache.
+
+    Proxy URLs carry an HMAC of the source URL, so /img/ only fetches URLs
+    this app put into a page. Without Pillow the original bytes are cached
+    and served unresized.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, secret=None, max_age=30 * 24 * 3600):
+        self.files = DiskLRU(directory, max_bytes)
+        # A random secret only holds for one process tree; set one when several servers share URLs
+        self.secret = (secret or secrets.token_hex(16)).encode()
+        self.max_age = max_age
+        self.flight = SingleFlight()
+        self.session = requests.Session()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def sign(self, url):
+        return hmac.new(self.secret, url.encode("utf-8"), hashlib.sha256).hexdigest()[:20]
+
+    def url_for(self, url, width=DEFAULT_WIDTH):
+        if not url or not url.startswith(("http://", "https://")):
+            return url
+        return f"/img/{self.sign(url)}?u={quote(url, safe='')}&w={width}"
+
+    def rewrite(self, data):
+        """Copy of ``data`` with every "image" field pointing at the proxy; the input is not modified."""
+        if isinstance(data, list):
+            return [self.rewrite(item) for item in data]
+        if isinstance(data, dict):
+            return {key: self.url_for(value) if key == "image" and isinstance(value, str) else self.rewrite(value)
+                    for key, value in data.items()}
+        return data
+
+    def reopen(self):
+        self.session = requests.Session()
+
+    def serve(self, signature, url, width, request):
+        if not url or not hmac.compare_digest(signature, self.sign(url)):
+            abort(403)
+        width = min(WIDTHS, key=lambda w: abs(w - width))
+        webp = Image is not None and request.accept_mimetypes["image/webp"] > 0
+        key = hashlib.blake2b(f"{url}|{width}".encode("utf-8"), digest_size=16).hexdigest()
+
+        if Image is None:
+            names = [f"{key}.{ext}" for ext in ORIGINAL_EXTENSIONS.values()]
+        else:
+            names = [f"{key}.webp", f"{key}.jpg"] if webp else [f"{key}.jpg"]
+        path = next(filter(None, map(self.files.get, names)), None)
+        if path:
+            self.hits += 1
+        else:
+            self.misses += 1
+            name = f"{key}.{'webp' if webp else 'jpg'}"
+            path = self.flight.do(name, lambda: self._fetch(url, width, key, webp))
+            if not path:
+                abort(502)
+
+        response = send_file(path, conditional=True, etag=os.path.basename(path), max_age=self.max_age)
+        response.headers['Cache-Control'] = f"public, max-age={self.max_age}, immutable"
+        response.headers['Vary'] = "Accept"
+        return response
+
+    def _fetch(self, url, width, key, webp):
+        try:
+            with self.session.get(url, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                if not content_type.startswith("image/"):
+                    raise ValueError(f"not an image: {content_type or 'no content type'}")
+                data = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ValueError("image too large")
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error fetching image {url}: {e}")
+            self.errors += 1
+            return None
+
+        if Image is None:
+            ext = ORIGINAL_EXTENSIONS.get(content_type, "jpg")
+            return self.files.set(f"{key}.{ext}", data)
+        try:
+            return self.files.set(f"{key}.{'webp' if webp else 'jpg'}", resize(data, width, webp))
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            print(f"Error resizing image {url}: {e}")
+            self.errors += 1
+            return None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors,
+                "bytes": self.files.size, "evictions": self.files.evictions}
+
+
+def resize(data, width, webp=False):
+    """Scales an image down to ``width`` pixels wide, encoded as WebP or progressive JPEG."""
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((width, width * 4))
+    out = io.BytesIO()
+    if webp:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(out, "WEBP", quality=80, method=4)
+    else:
+        image.convert("RGB").save(out, "JPEG", quality=82, optimize=True, progressive=True)
+    return out.getvalue()
@@ -0,0 +1,245 @@
+import bisect
+import contextvars
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(labelnames, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            items = sorted((labels, ([*s[0]], s[1], s[2])) for labels, s in self._series.items())
+        for labels, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time, e.g. a cache's stats()."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._callbacks = {}
+
+    def set_function(self, fn, *labels):
+        self._callbacks[labels] = fn
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, fn in sorted(self._callbacks.items()):
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Error collecting {self.name}: {e}")
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+ROUTE_SECONDS = REGISTRY.register(Histogram(
+    "otakudesu_route_seconds", "Time spent per route, split by phase (network, parse, render, total).",
+    ("route", "phase")))
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    "otakudesu_upstream_seconds", "Time spent waiting on upstream HTTP responses.", ("page",)))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    "otakudesu_parse_seconds", "Time spent building parse trees of upstream pages.", ("page",)))
+RENDER_SECONDS = REGISTRY.register(Histogram(
+    "otakudesu_render_seconds", "Time spent rendering Jinja templates.", ("template",)))
+SCRAPER_SECONDS = REGISTRY.register(Histogram(
+    "otakudesu_scraper_seconds", "Time spent in scraper methods on a cache miss.", ("method",)))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    "otakudesu_upstream_responses_total", "Upstream HTTP responses by status code.", ("status",)))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "otakudesu_upstream_errors_total", "Failures talking to upstream hosts.", ("where", "error")))
+CACHE_STAT = REGISTRY.register(Gauge(
+    "otakudesu_cache", "Cache counters and ratios as reported by each cache's stats().", ("cache", "stat")))
+
+# Per-request accumulator of phase timings, filled in by phase()
+_request_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+def start_request():
+    phases = {}
+    _request_phases.set(phases)
+    return phases
+
+
+def end_request():
+    phases = _request_phases.get()
+    _request_phases.set(None)
+    return phases or {}
+
+
+@contextmanager
+def phase(name, histogram, *labels):
+    """Times a block into ``histogram`` and, unless ``name`` is None, the current request's phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, *labels)
+        if name:
+            add_phase(name, elapsed)
+
+
+def add_phase(name, seconds):
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def record_error(where, error):
+    UPSTREAM_ERRORS.inc(where, type(error).__name__)
+
+
+def register_stats(cache_name, stats):
+    """Exposes every numeric key of ``stats()`` as otakudesu_cache{cache=...,stat=...}."""
+    for key, value in stats().items():
+        if isinstance(value, (int, float)):
+            CACHE_STAT.set_function(lambda key=key: stats()[key], cache_name, key)
+
+
+class SlowRequestProfiler:
+    """Opt-in sampling profiler that keeps the slowest sampled requests.
+
+    A ``sample_rate`` fraction of requests runs under cProfile (one at a
+    time, since the interpreter supports a single active profiler); the
+    ``keep`` slowest profiles are written to ``out_dir`` as .prof files plus
+    a text summary of the top functions by cumulative time.
+    """
+
+    def __init__(self, sample_rate, out_dir, keep=10):
+        self.sample_rate = sample_rate
+        self.out_dir = out_dir
+        self.keep = keep
+        self._slowest = []
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def start(self):
+        if random.random() >= self.sample_rate or not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            self._active.release()
+            return None
+        return profile
+
+    def stop(self, profile, name, elapsed):
+        profile.disable()
+        self._active.release()
+        with self._lock:
+            if len(self._slowest) >= self.keep and elapsed <= self._slowest[0][0]:
+                return
+            stem = f"{elapsed * 1000:09.1f}ms-{name.strip('/').replace('/', '_') or 'index'}-{int(time.time() * 1000)}"
+            entry = (elapsed, stem)
+            if len(self._slowest) >= self.keep:
+                _, dropped = heapq.heapreplace(self._slowest, entry)
+                for ext in (".prof", ".txt"):
+                    try:
+                        os.remove(os.path.join(self.out_dir, dropped + ext))
+                    except OSError:
+                        pass
+            else:
+                heapq.heappush(self._slowest, entry)
+
+        path = os.path.join(self.out_dir, stem)
+        profile.dump_stats(path + ".prof")
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(30)
+        with open(path + ".txt", "w") as f:
+            f.write(f"{name} took {elapsed * 1000:.1f} ms\n\n{summary.getvalue()}")
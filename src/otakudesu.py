@@ -0,0 +1,177 @@
+"""Command-line entry point.
+
+Usage: python -m otakudesu export <slug> [-o out.jsonl] [--workers 8] [--quality 720p]
+
+Resolves every episode of an anime and every mirror of each episode on a
+bounded worker pool, writing one JSON line per episode as soon as all its
+mirrors are resolved. Finished episodes are appended to a checkpoint file
+(<out>.done by default) so an interrupted export resumes where it stopped;
+episodes with unresolved mirrors are left out of both and retried on the
+next run (--partial keeps those with at least one resolved mirror).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from resilience import UpstreamGuard, TokenBucket
+from scraper import OtakudesuScraper
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class Exporter:
+    def __init__(self, scraper, workers=8, qualities=None, partial=False, log=sys.stderr):
+        self.scraper = scraper
+        self.workers = workers
+        self.qualities = set(qualities) if qualities else None
+        # Without ``partial`` an episode counts as exported only once every mirror resolved
+        self.partial = partial
+        self.log = log
+        self.stats = {"episodes": 0, "mirrors": 0, "resolved": 0, "failed": 0}
+
+    def export(self, slug, out, checkpoint=None):
+        """Writes one JSON line per episode of ``slug`` to ``out``; returns the number of failed episodes."""
+        start = time.perf_counter()
+        details = self.scraper.get_anime_details(slug)
+        if not details or not details.get('episodes'):
+            print(f"Error exporting {slug}: no episodes found", file=self.log)
+            return 1
+
+        done = load_checkpoint(checkpoint)
+        episodes = [ep for ep in details['episodes'] if ep['slug'] not in done]
+        print(f"{details.get('title', slug)}: {len(details['episodes'])} episodes, "
+              f"{len(details['episodes']) - len(episodes)} already exported", file=self.log)
+
+        checkpoint_file = open(checkpoint, 'a') if checkpoint else None
+        # episode slug -> {"record": ..., "pending": outstanding mirror count}
+        jobs = {}
+        queue = iter(episodes)
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                running = {}
+
+                def start_next_episode():
+                    # Only ``workers`` episodes are open at once, so each one's mirrors
+                    # are resolved (and its line written) before later pages are fetched
+                    ep = next(queue, None)
+                    if ep is not None:
+                        running[pool.submit(self.scraper.get_episode_details, ep['slug'])] = ("episode", ep, None)
+
+                for _ in range(self.workers):
+                    start_next_episode()
+                while running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        kind, ep, mirror = running.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"Error exporting {ep['slug']}: {e}", file=self.log)
+                            result = None
+                        if kind == "episode":
+                            for mirror_future, mirror in self._start_episode(pool, jobs, slug, ep, result):
+                                running[mirror_future] = ("mirror", ep, mirror)
+                        else:
+                            mirror['url'] = result
+                            self.stats["mirrors"] += 1
+                            if result:
+                                self.stats["resolved"] += 1
+                                jobs[ep['slug']]["resolved"] += 1
+                            jobs[ep['slug']]["pending"] -= 1
+                        job = jobs.get(ep['slug'])
+                        if job is not None and job["pending"] == 0:
+                            self._finish(jobs.pop(ep['slug']), out, checkpoint_file)
+                            start_next_episode()
+                        elif kind == "episode" and job is None:
+                            start_next_episode()
+        finally:
+            if checkpoint_file:
+                checkpoint_file.close()
+
+        self.report(time.perf_counter() - start)
+        return self.stats["failed"]
+
+    def _start_episode(self, pool, jobs, anime_slug, ep, details):
+        if not details:
+            print(f"Error exporting {ep['slug']}: episode page unavailable", file=self.log)
+            self.stats["failed"] += 1
+            return []
+        record = {
+            "anime": anime_slug,
+            "episode": ep['slug'],
+            "title": details.get('title') or ep.get('title'),
+            "default_stream": details.get('default_stream', ""),
+            "mirrors": {},
+        }
+        mirrors = []
+        for quality, q_mirrors in (details.get('mirrors') or {}).items():
+            if self.qualities and quality not in self.qualities:
+                continue
+            record["mirrors"][quality] = [{"host": m['host'], "data_content": m['data_content'], "url": None}
+                                          for m in q_mirrors if m.get('data_content')]
+            mirrors.extend(record["mirrors"][quality])
+        jobs[ep['slug']] = {"record": record, "pending": len(mirrors), "mirrors": len(mirrors), "resolved": 0}
+        return [(pool.submit(self.scraper.resolve_stream, m['data_content']), m) for m in mirrors]
+
+    def _finish(self, job, out, checkpoint_file):
+        record = job["record"]
+        complete = job["resolved"] == job["mirrors"] or (self.partial and job["resolved"] > 0)
+        if not complete:
+            # Left out of the output and the checkpoint so a rerun retries it
+            print(f"Error exporting {record['episode']}: resolved {job['resolved']}/{job['mirrors']} mirrors",
+                  file=self.log)
+            self.stats["failed"] += 1
+            return
+        for q_mirrors in record["mirrors"].values():
+            for mirror in q_mirrors:
+                del mirror['data_content']
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        self.stats["episodes"] += 1
+        if checkpoint_file:
+            checkpoint_file.write(record["episode"] + "\n")
+            checkpoint_file.flush()
+
+    def report(self, elapsed):
+        s = self.stats
+        print(f"exported {s['episodes']} episodes, resolved {s['resolved']}/{s['mirrors']} mirrors, "
+              f"{s['failed']} episodes failed in {elapsed:.1f}s "
+              f"({s['episodes'] / elapsed if elapsed else 0:.2f} episodes/s, "
+              f"{s['mirrors'] / elapsed if elapsed else 0:.2f} mirrors/s)", file=self.log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="otakudesu", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="resolve every episode and mirror of an anime to JSON Lines")
+    export.add_argument("slug")
+    export.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    export.add_argument("--checkpoint", default=None, help="checkpoint file (default: <output>.done)")
+    export.add_argument("--workers", type=int, default=8)
+    export.add_argument("--quality", action="append", help="only these qualities, e.g. --quality 720p")
+    export.add_argument("--partial", action="store_true",
+                        help="also export (and checkpoint) episodes where only some mirrors resolved")
+    export.add_argument("--rate", type=float, default=5.0, help="upstream requests per second")
+    export.add_argument("--base-url", default=os.environ.get('OTAKUDESU_BASE_URL'))
+    args = parser.parse_args(argv)
+
+    scraper = OtakudesuScraper(base_url=args.base_url,
+                               guard=UpstreamGuard(limiter=TokenBucket(args.rate, max(1, int(args.rate)))))
+    exporter = Exporter(scraper, workers=args.workers, qualities=args.quality, partial=args.partial)
+    if args.output == "-":
+        return 1 if exporter.export(args.slug, sys.stdout, args.checkpoint) else 0
+    checkpoint = args.checkpoint or args.output + ".done"
+    with open(args.output, 'a', encoding='utf-8') as out:
+        return 1 if exporter.export(args.slug, out, checkpoint) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+from bs4 import BeautifulSoup
+from bs4.filter import ElementFilter
+
+
+class SubtreeFilter(ElementFilter):
+    """parse_only filter that keeps whole subtrees rooted at matching tags.
+
+    Each rule is a ``(tag name, attribute, value)`` triple, e.g.
+    ``("div", "class", "venz")``; an attribute of None matches every tag of
+    that name. Unlike a single SoupStrainer the rules are OR'ed, so one pass
+    can keep e.g. ``h1.posttl``, ``div.mirrorstream`` and every ``iframe``.
+    Everything outside the kept subtrees is discarded by the tree builder
+    before any Tag objects are created for it.
+    """
+
+    def __init__(self, *rules):
+        super().__init__()
+        self.rules = rules
+
+    @property
+    def includes_everything(self):
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        for rule_name, attr, value in self.rules:
+            if name != rule_name:
+                continue
+            if attr is None:
+                return True
+            found = attrs.get(attr) if attrs else None
+            if isinstance(found, str):
+                found = found.split() if attr == "class" else [found]
+            if found and value in found:
+                return True
+        return False
+
+    def allow_string_creation(self, string):
+        return False
+
+
+# Subtrees each OtakudesuScraper parser reads, keyed by page type
+PAGE_FILTERS = {
+    "home": SubtreeFilter(("div", "class", "venz")),
+    "ongoing": SubtreeFilter(("div", "class", "venz")),
+    "anime_list": SubtreeFilter(("div", "id", "abtext")),
+    "genre_list": SubtreeFilter(("ul", "class", "genres")),
+    "genre": SubtreeFilter(("div", "class", "col-anime")),
+    "search": SubtreeFilter(("ul", "class", "chivsrc")),
+    "anime_details": SubtreeFilter(
+        ("div", "class", "fotoanime"),
+        ("div", "class", "infozingle"),
+        ("div", "class", "sinopc"),
+        ("div", "class", "jdlrx"),
+        ("div", "class", "episodelist"),
+    ),
+    "episode_details": SubtreeFilter(
+        ("h1", "class", "posttl"),
+        ("div", "class", "prevnext"),
+        ("div", "class", "mirrorstream"),
+        ("iframe", None, None),
+    ),
+    "desustream": SubtreeFilter(("iframe", None, None)),
+    "blogger": SubtreeFilter(("script", None, None)),
+}
+
+# Pages where bench/bench_parse.py shows straining paying for itself; the
+# anime_list, anime_details and blogger filters keep most of the page and
+# gain little or nothing over a full parse
+STRAINED_PAGES = frozenset({"home", "ongoing", "genre_list", "genre", "search", "episode_details", "desustream"})
+
+
+def make_soup(content, page=None, strained=True):
+    """Parses ``content`` with lxml, keeping only the subtrees ``page`` needs when strained."""
+    parse_only = PAGE_FILTERS.get(page) if strained else None
+    return BeautifulSoup(content, "lxml", parse_only=parse_only)
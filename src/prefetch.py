@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from resilience import TokenBucket
+
+
+class Prefetcher:
+    """Warms the cache for the episode a viewer is most likely to open next.
+
+    After an episode page is served, schedule() fetches the next episode's
+    details and resolves its default-quality mirror through the (cached)
+    scraper on a small worker pool. Work is dropped rather than queued when
+    the pool is busy, the per-minute budget is spent or the slug was
+    prefetched recently, so foreground requests keep the upstream budget.
+    """
+
+    PREFERRED_QUALITIES = ("720p", "480p", "360p")
+
+    def __init__(self, scraper, max_workers=2, max_pending=4, per_minute=20, recent_ttl=1800, max_recent=512):
+        self.scraper = scraper
+        self.max_pending = max_pending
+        self.recent_ttl = recent_ttl
+        self.max_recent = max_recent
+        self.budget = TokenBucket(rate=per_minute / 60.0, capacity=max(1, per_minute // 4))
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="prefetch")
+        self.stats_counts = {"scheduled": 0, "completed": 0, "errors": 0,
+                             "skipped_recent": 0, "skipped_busy": 0, "skipped_budget": 0}
+        self._pending = set()
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def schedule(self, slug):
+        """Queues a prefetch of ``slug``; returns False if it was skipped."""
+        if not slug:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            seen = self._recent.get(slug)
+            if slug in self._pending or (seen is not None and now - seen < self.recent_ttl):
+                self.stats_counts["skipped_recent"] += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.stats_counts["skipped_busy"] += 1
+                return False
+            if not self.budget.try_acquire():
+                self.stats_counts["skipped_budget"] += 1
+                return False
+            self._pending.add(slug)
+            self.stats_counts["scheduled"] += 1
+        self.executor.submit(self._run, slug)
+        return True
+
+    def _run(self, slug):
+        try:
+            self.prefetch(slug)
+            self.stats_counts["completed"] += 1
+        except Exception as e:
+            print(f"Error prefetching episode {slug}: {e}")
+            self.stats_counts["errors"] += 1
+        finally:
+            with self._lock:
+                self._pending.discard(slug)
+                self._recent[slug] = time.monotonic()
+                self._recent.move_to_end(slug)
+                while len(self._recent) > self.max_recent:
+                    self._recent.popitem(last=False)
+
+    def prefetch(self, slug):
+        details = self.scraper.get_episode_details(slug)
+        if not details:
+            return
+        mirror = self.default_mirror(details.get('mirrors') or {})
+        if mirror:
+            self.scraper.resolve_stream(mirror['data_content'])
+        default_stream = details.get('default_stream') or ""
+        if "desustream" in default_stream:
+            self.scraper.extract_video_from_desustream(default_stream)
+
+    def default_mirror(self, mirrors):
+        """First mirror of the preferred quality, favouring desustream-hosted ones."""
+        qualities = [q for q in self.PREFERRED_QUALITIES if mirrors.get(q)] or [q for q in mirrors if mirrors[q]]
+        if not qualities:
+            return None
+        candidates = [m for m in mirrors[qualities[0]] if m.get('data_content')]
+        for mirror in candidates:
+            if "desu" in mirror.get('host', '').lower():
+                return mirror
+        return candidates[0] if candidates else None
+
+    def stats(self):
+        return dict(self.stats_counts, pending=len(self._pending))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response
+
+from cache import CacheEntry, LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _encode(value):
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if to_dict else str(value)
+
+
+def content_hash(template, context, version=""):
+    """Digest of a template name, the data it is rendered with and the templates' version."""
+    material = json.dumps([version, template, context], sort_keys=True, separators=(",", ":"), default=_encode)
+    return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def templates_version(directory):
+    """Digest of every template file, so a template deploy changes every page's ETag."""
+    digest = hashlib.blake2b(digest_size=8)
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, directory).encode("utf-8"))
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RenderedPage:
+    __slots__ = ("etag", "body", "gzip", "br", "size")
+
+    def __init__(self, etag, body, compress_min_size=1024):
+        self.etag = etag
+        self.body = body
+        big = len(body) >= compress_min_size
+        self.gzip = gzip.compress(body, 6) if big else None
+        self.br = brotli.compress(body, quality=9) if big and brotli is not None else None
+        self.size = len(body) + len(self.gzip or b"") + len(self.br or b"")
+
+    def variant(self, accept_encodings):
+        """Returns (encoding, body, etag) for the best encoding the client accepts."""
+        if self.br is not None and accept_encodings["br"]:
+            return "br", self.br, f'"{self.etag}-br"'
+        if self.gzip is not None and accept_encodings["gzip"]:
+            return "gzip", self.gzip, f'"{self.etag}-gz"'
+        return None, self.body, f'"{self.etag}"'
+
+
+class RenderCache:
+    """Rendered HTML keyed by a content hash of the template's context.
+
+    Unchanged scraper data skips Jinja entirely, the hash doubles as a
+    strong ETag so revalidations get a 304 without a body, and gzip (plus
+    brotli when installed) variants are compressed once when stored.
+    ``version`` (a build id or templates_version) is part of the hash, so
+    pages rendered from older templates never revalidate as current.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, compress_min_size=1024, version=""):
+        self.pages = LRUCache(max_bytes=max_bytes)
+        self.version = version
+        self.compress_min_size = compress_min_size
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get_or_render(self, template, context, render):
+        etag = content_hash(template, context, self.version)
+        entry = self.pages.get(etag)
+        if entry is not None:
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        page = RenderedPage(etag, render().encode("utf-8"), self.compress_min_size)
+        self.pages.set(etag, CacheEntry(page, float("inf"), float("inf"), size=page.size))
+        return page
+
+    def respond(self, page, request):
+        encoding, body, etag = page.variant(request.accept_encodings)
+        if request.if_none_match.contains_raw(etag) or request.if_none_match.contains_raw(f'"{page.etag}"'):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype="text/html")
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.pages),
+            "bytes": self.pages.current_bytes,
+        }
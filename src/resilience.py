@@ -0,0 +1,256 @@
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests/second with bursts up to ``capacity``."""
+
+    def __init__(self, rate=10.0, capacity=20):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self):
+        """Takes a token only if one is available now."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reopen(self):
+        self._lock = threading.Lock()
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket kept in a SQLite file so every worker process draws from one budget.
+
+    Falls back to the in-process bucket if the file cannot be used.
+    """
+
+    def __init__(self, path, rate=10.0, capacity=20, name="upstream"):
+        super().__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, force):
+        """Returns the tokens left after taking one (negative means owed), or None if refused."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            tokens = self.capacity if row is None else min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            if tokens < 1 and not force:
+                conn.execute("COMMIT")
+                return None
+            tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                         (self.name, tokens, now))
+            conn.execute("COMMIT")
+            return tokens
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reserve(self):
+        try:
+            tokens = self._take(True)
+        except sqlite3.Error as e:
+            print(f"Error using rate budget {self.path}: {e}")
+            return super().reserve()
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def try_acquire(self):
+        try:
+            return self._take(False) is not None
+        except sqlite3.Error as e:
+            print(f"Error using rate budget {self.path}: {e}")
+            return super().try_acquire()
+
+    def reopen(self):
+        super().reopen()
+        self._local = threading.local()
+
+
+class CircuitBreaker:
+    """Opens when the failure ratio over the last ``window`` calls reaches ``threshold``.
+
+    While open every call fails fast; after ``cooldown`` seconds one trial
+    call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=0.5, window=20, min_calls=10, cooldown=30.0):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.opened = 0
+        self._results = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self.state = self.CLOSED
+                    self._results.clear()
+                else:
+                    self._open()
+                return
+            self._results.append(success)
+            if len(self._results) >= self.min_calls:
+                failures = self._results.count(False)
+                if failures / len(self._results) >= self.threshold:
+                    self._open()
+
+    def reopen(self):
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+
+class UpstreamGuard:
+    """Rate limit, retry with jittered exponential backoff, and circuit breaking for upstream calls.
+
+    The scrapers drive it through before_attempt / record / backoff so the
+    same policy serves both the requests and the httpx engines; request()
+    is the synchronous loop.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    # A Cloudflare challenge is a 403: retrying will not pass it, but the breaker should back off
+    FAILURE_STATUSES = RETRY_STATUSES | {403}
+
+    def __init__(self, limiter=None, breaker=None, retries=2, base_delay=0.25, max_delay=4.0):
+        self.limiter = limiter if limiter is not None else TokenBucket()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retried = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+
+    def before_attempt(self):
+        """Returns the rate-limit wait for the next attempt, or raises CircuitOpenError."""
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("upstream circuit breaker is open")
+        wait = self.limiter.reserve()
+        self.throttled_seconds += wait
+        return wait
+
+    def record(self, status=None, error=None, expected=()):
+        """Feeds one attempt's outcome to the breaker; returns True if it is worth retrying.
+
+        ``expected`` statuses are ordinary answers for the call being made,
+        e.g. admin-ajax rejecting a stale nonce with 403.
+        """
+        failed = error is not None or (status in self.FAILURE_STATUSES and status not in expected)
+        self.breaker.record(not failed)
+        return error is not None or status in self.RETRY_STATUSES
+
+    def backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential delay before retry number ``attempt`` (0-based)."""
+        self.retried += 1
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def request(self, send, idempotent=True, retry_exceptions=(Exception,), expected=()):
+        attempts = 1 + (self.retries if idempotent else 0)
+        for attempt in range(attempts):
+            wait = self.before_attempt()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = send()
+            except retry_exceptions as e:
+                self.record(error=e)
+                if attempt + 1 >= attempts:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            except BaseException as e:
+                # Any other error still settles a half-open trial, or the breaker would stay shut
+                self.record(error=e)
+                raise
+            if not self.record(status=response.status_code, expected=expected) or attempt + 1 >= attempts:
+                return response
+            time.sleep(self.backoff(attempt, response.headers.get('Retry-After')))
+
+    def reopen(self):
+        self.limiter.reopen()
+        self.breaker.reopen()
+
+    def stats(self):
+        return {
+            "circuit_open": int(self.breaker.state != CircuitBreaker.CLOSED),
+            "circuit_opened": self.breaker.opened,
+            "retries": self.retried,
+            "rejected": self.rejected,
+            "throttled_seconds": self.throttled_seconds,
+        }
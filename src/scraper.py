@@ -1,11 +1,41 @@
 import requests
 from bs4 import BeautifulSoup
+from parsing import STRAINED_PAGES, make_soup
+from metrics import phase, record_error, UPSTREAM_SECONDS, PARSE_SECONDS, UPSTREAM_RESPONSES
+from resilience import CircuitOpenError, UpstreamGuard
+from extractors import find_extractor
+from concurrent.futures import ThreadPoolExecutor
 import re
 import json
 import base64
+import threading
+import time
+from urllib.parse import quote_plus
+
+
+def find_text(parent, name, class_):
+    tag = parent.find(name, class_=class_)
+    return tag.get_text(strip=True) if tag else ""
+
+
+def resolve_all(resolve, data_contents, max_workers=8):
+    """Resolve many mirror payloads concurrently, returning {data_content: url}."""
+    unique = list(dict.fromkeys(dc for dc in data_contents if dc))
+    if not unique:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as pool:
+        return dict(zip(unique, pool.map(resolve, unique)))
 
 class OtakudesuScraper:
     BASE_URL = "https://otakudesu.best"
+    AJAX_PATH = "/wp-admin/admin-ajax.php"
+    NONCE_ACTION = "aa1208d27f29ca340c92c66d1926f13f"
+    EMBED_ACTION = "2a3505c93b0035d3f455df82bf976b84"
+    NONCE_TTL = 600
+    # admin-ajax's answer to a stale nonce, not an upstream failure
+    NONCE_REJECTED_STATUSES = (400, 403)
+    # desustream player -> blogger page -> streams
+    MAX_EXTRACT_HOPS = 3
     HEADERS = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
@@ -18,27 +48,81 @@ class OtakudesuScraper:
         "Sec-Fetch-User": "?1"
     }
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(self.HEADERS)
-
-    def _get_soup(self, url):
+    def __init__(self, base_url=None, strained_pages=None, guard=None):
+        if base_url:
+            self.BASE_URL = base_url.rstrip('/')
+        # Pages parsed through their PAGE_FILTERS subtree filter (default: STRAINED_PAGES); the rest get a full parse
+        self.strained_pages = STRAINED_PAGES if strained_pages is None else frozenset(strained_pages)
+        self.session = self._make_session()
+        # Rate limit, retries and circuit breaker for requests to BASE_URL
+        self.guard = guard if guard is not None else UpstreamGuard()
+        self._nonce = None
+        self._nonce_expires = 0
+        self._nonce_lock = threading.Lock()
+
+    def _make_session(self):
+        session = requests.Session()
+        session.headers.update(self.HEADERS)
+        return session
+
+    def reopen(self):
+        """Replaces the HTTP session and locks inherited across fork()."""
+        self.session = self._make_session()
+        self._nonce_lock = threading.Lock()
+        self.guard.reopen()
+
+    def _send(self, method, url, expected=(), **kwargs):
+        request = self.session.get if method == "GET" else self.session.post
+        send = lambda: request(url, timeout=10, **kwargs)
+        if not url.startswith(self.BASE_URL):
+            return send()
+        # Only GETs are retried; admin-ajax POSTs have their own nonce retry
+        return self.guard.request(send, idempotent=method == "GET",
+                                  retry_exceptions=(requests.RequestException,), expected=expected)
+
+    def _get_soup(self, url, page=None):
         try:
-            response = self.session.get(url, timeout=10)
+            with phase("network", UPSTREAM_SECONDS, page or "other"):
+                response = self._send("GET", url)
+            UPSTREAM_RESPONSES.inc(str(response.status_code))
             response.raise_for_status()
-            return BeautifulSoup(response.content, "lxml")
-        except requests.RequestException as e:
+            with phase("parse", PARSE_SECONDS, page or "other"):
+                return self.make_soup(response.content, page)
+        except (requests.RequestException, CircuitOpenError) as e:
             print(f"Error fetching {url}: {e}")
+            record_error("fetch", e)
             return None
 
-    def get_home(self):
-        soup = self._get_soup(self.BASE_URL + "/") # Ensure trailing slash to match index.csv likely
-        if not soup:
-            soup = self._get_soup(self.BASE_URL) # Try without if failed
+    def fetch_page(self, url, etag=None, last_modified=None):
+        """Conditional GET returning (status_code, content, etag, last_modified), or None on error."""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            with phase("network", UPSTREAM_SECONDS, "conditional"):
+                response = self._send("GET", url, headers=headers)
+            UPSTREAM_RESPONSES.inc(str(response.status_code))
+            if response.status_code != 304:
+                response.raise_for_status()
+            return (response.status_code, response.content,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except (requests.RequestException, CircuitOpenError) as e:
+            print(f"Error fetching {url}: {e}")
+            record_error("fetch", e)
+            return None
 
+    def make_soup(self, content, page=None):
+        return make_soup(content, page, strained=page in self.strained_pages)
+
+    def get_home(self):
+        soup = self._get_soup(self.BASE_URL + "/", "home")
         if not soup:
             return {"ongoing": [], "complete": []}
+        return self.parse_home(soup)
 
+    def parse_home(self, soup):
         ongoing = []
         venz = soup.find('div', class_='venz')
         if venz:
@@ -46,9 +130,9 @@ class OtakudesuScraper:
                 detpost = item.find('div', class_='detpost')
                 thumb = item.find('div', class_='thumb')
                 if detpost and thumb:
-                    ep = detpost.find('div', class_='epz').get_text(strip=True) if detpost.find('div', class_='epz') else ""
-                    day = detpost.find('div', class_='epztipe').get_text(strip=True) if detpost.find('div', class_='epztipe') else ""
-                    date = detpost.find('div', class_='newnime').get_text(strip=True) if detpost.find('div', class_='newnime') else ""
+                    ep = find_text(detpost, 'div', 'epz')
+                    day = find_text(detpost, 'div', 'epztipe')
+                    date = find_text(detpost, 'div', 'newnime')
 
                     link_tag = thumb.find('a')
                     img_tag = thumb.find('img')
@@ -68,11 +152,15 @@ class OtakudesuScraper:
         return {"ongoing": ongoing, "complete": []}
 
     def get_ongoing_anime(self, page=1):
-        url = f"{self.BASE_URL}/ongoing-anime/page/{page}/" if page > 1 else f"{self.BASE_URL}/ongoing-anime/"
-        soup = self._get_soup(url)
+        soup = self._get_soup(self.ongoing_url(page), "ongoing")
         if not soup:
             return []
+        return self.parse_ongoing(soup)
 
+    def ongoing_url(self, page=1):
+        return f"{self.BASE_URL}/ongoing-anime/page/{page}/" if page > 1 else f"{self.BASE_URL}/ongoing-anime/"
+
+    def parse_ongoing(self, soup):
         anime_list = []
         venz = soup.find('div', class_='venz')
         if venz:
@@ -84,7 +172,7 @@ class OtakudesuScraper:
                     title_tag = thumb.find('h2', class_='jdlflm')
 
                     detpost = item.find('div', class_='detpost')
-                    ep = detpost.find('div', class_='epz').get_text(strip=True) if detpost and detpost.find('div', class_='epz') else ""
+                    ep = find_text(detpost, 'div', 'epz') if detpost else ""
 
                     if link_tag and img_tag and title_tag:
                          anime_list.append({
@@ -98,28 +186,33 @@ class OtakudesuScraper:
 
     def get_anime_list(self):
         url = f"{self.BASE_URL}/anime-list/"
-        soup = self._get_soup(url)
+        soup = self._get_soup(url, "anime_list")
         if not soup:
             return []
+        return self.parse_anime_list(soup)
 
-        anime_list = []
+    def parse_anime_list(self, soup):
+        return list(self.iter_anime_list(soup))
+
+    def iter_anime_list(self, soup):
         content = soup.find('div', id='abtext')
         if content:
              for item in content.find_all('div', class_='jdlbar'):
                  for link in item.find_all('a'):
-                     anime_list.append({
+                     yield {
                          "title": link.get_text(strip=True),
                          "slug": link['href'].strip('/').split('/')[-1],
                          "url": link['href']
-                     })
-        return anime_list
+                     }
 
     def get_genre_list(self):
         url = f"{self.BASE_URL}/genre-list/"
-        soup = self._get_soup(url)
+        soup = self._get_soup(url, "genre_list")
         if not soup:
             return []
+        return self.parse_genre_list(soup)
 
+    def parse_genre_list(self, soup):
         genres = []
         genre_list = soup.find('ul', class_='genres')
         if genre_list:
@@ -131,12 +224,48 @@ class OtakudesuScraper:
                 })
         return genres
 
+    def get_genre_anime(self, slug, page=1):
+        soup = self._get_soup(self.genre_url(slug, page), "genre")
+        if not soup:
+            return []
+        return self.parse_genre_page(soup)
+
+    def genre_url(self, slug, page=1):
+        return f"{self.BASE_URL}/genres/{slug}/page/{page}/" if page > 1 else f"{self.BASE_URL}/genres/{slug}/"
+
+    def parse_genre_page(self, soup):
+        anime_list = []
+        for item in soup.find_all('div', class_='col-anime'):
+            title_div = item.find('div', class_='col-anime-title')
+            link_tag = title_div.find('a') if title_div else None
+            if not link_tag:
+                continue
+            cover = item.find('div', class_='col-anime-cover')
+            img_tag = cover.find('img') if cover else None
+            genre_div = item.find('div', class_='col-anime-genre')
+            anime_list.append({
+                "title": link_tag.get_text(strip=True),
+                "slug": link_tag['href'].strip('/').split('/')[-1],
+                "image": img_tag['src'] if img_tag else "",
+                "studio": find_text(item, 'div', 'col-anime-studio'),
+                "episodes": find_text(item, 'div', 'col-anime-eps'),
+                "rating": find_text(item, 'div', 'col-anime-rating'),
+                "season": find_text(item, 'div', 'col-anime-date'),
+                "genres": [a.get_text(strip=True) for a in genre_div.find_all('a')] if genre_div else [],
+                "url": link_tag['href']
+            })
+        return anime_list
+
     def search_anime(self, query):
-        url = f"{self.BASE_URL}/?s={query}&post_type=anime"
-        soup = self._get_soup(url)
+        soup = self._get_soup(self.search_url(query), "search")
         if not soup:
             return []
+        return self.parse_search(soup)
+
+    def search_url(self, query):
+        return f"{self.BASE_URL}/?s={quote_plus(query)}&post_type=anime"
 
+    def parse_search(self, soup):
         results = []
         ul = soup.find('ul', class_='chivsrc')
         if ul:
@@ -156,10 +285,12 @@ class OtakudesuScraper:
 
     def get_anime_details(self, slug):
         url = f"{self.BASE_URL}/anime/{slug}/"
-        soup = self._get_soup(url)
+        soup = self._get_soup(url, "anime_details")
         if not soup:
             return None
+        return self.parse_anime_details(soup, slug)
 
+    def parse_anime_details(self, soup, slug):
         details = {}
         # Title
         info_div = soup.find('div', class_='fotoanime')
@@ -189,13 +320,15 @@ class OtakudesuScraper:
 
         # Episode List
         episode_list = []
+        seen = set()
         for episodelist_div in soup.find_all('div', class_='episodelist'):
              for item in episodelist_div.find_all('li'):
                 link = item.find('a')
-                date = item.find('span', class_='zeebr').get_text(strip=True) if item.find('span', class_='zeebr') else ""
+                date = find_text(item, 'span', 'zeebr')
                 if link:
                     slug_ep = link['href'].strip('/').split('/')[-1]
-                    if not any(e['slug'] == slug_ep for e in episode_list):
+                    if slug_ep not in seen:
+                        seen.add(slug_ep)
                         episode_list.append({
                             "title": link.get_text(strip=True),
                             "slug": slug_ep,
@@ -207,10 +340,12 @@ class OtakudesuScraper:
 
     def get_episode_details(self, slug):
         url = f"{self.BASE_URL}/episode/{slug}/"
-        soup = self._get_soup(url)
+        soup = self._get_soup(url, "episode_details")
         if not soup:
             return None
+        return self.parse_episode_details(soup, slug)
 
+    def parse_episode_details(self, soup, slug):
         data = {}
 
         # Title
@@ -257,91 +392,151 @@ class OtakudesuScraper:
 
         return data
 
-    def resolve_stream(self, data_content):
-        # Step 1: Get Nonce
-        try:
-            res = self.session.post(
-                f"{self.BASE_URL}/wp-admin/admin-ajax.php",
-                data={"action": "aa1208d27f29ca340c92c66d1926f13f"},
-                timeout=10
-            )
-            res.raise_for_status()
-            response_json = res.json()
-            nonce = response_json.get('data')
-        except Exception as e:
-            print(f"Error getting nonce: {e}")
-            return None
+    def _get_nonce(self, rejected=None):
+        """The cached nonce, fetching a new one when it has expired or is the ``rejected`` one."""
+        with self._nonce_lock:
+            # Concurrent resolves rejected with the same nonce share the one refresh
+            if self._nonce and self._nonce != rejected and time.time() < self._nonce_expires:
+                return self._nonce
+            try:
+                with phase("network", UPSTREAM_SECONDS, "ajax"):
+                    res = self._send(
+                        "POST", self.BASE_URL + self.AJAX_PATH,
+                        data={"action": self.NONCE_ACTION}
+                    )
+                UPSTREAM_RESPONSES.inc(str(res.status_code))
+                res.raise_for_status()
+                nonce = res.json().get('data')
+            except Exception as e:
+                print(f"Error getting nonce: {e}")
+                record_error("nonce", e)
+                return None
+            self.store_nonce(nonce)
+            return nonce
+
+    def store_nonce(self, nonce):
+        self._nonce = nonce
+        self._nonce_expires = time.time() + self.NONCE_TTL if nonce else 0
 
+    def resolve_stream(self, data_content):
+        nonce = self._get_nonce()
         if not nonce:
             return None
 
-        # Step 2: Get Embed Code
         try:
-            params = json.loads(base64.b64decode(data_content).decode('utf-8'))
-
-            payload = params.copy()
-            payload['nonce'] = nonce
-            payload['action'] = "2a3505c93b0035d3f455df82bf976b84"
-
-            res = self.session.post(
-                f"{self.BASE_URL}/wp-admin/admin-ajax.php",
-                data=payload,
-                timeout=10
-            )
-            res.raise_for_status()
-            embed_data = res.json().get('data')
-            if embed_data:
-                html_embed = base64.b64decode(embed_data).decode('utf-8')
-                soup = BeautifulSoup(html_embed, 'lxml')
-                iframe = soup.find('iframe')
-                if iframe:
-                    return iframe['src']
+            rejected, embed_data = self._post_embed(data_content, nonce)
+            if rejected:
+                # The cached nonce expired upstream; fetch a fresh one and retry once
+                nonce = self._get_nonce(rejected=nonce)
+                if not nonce:
+                    return None
+                rejected, embed_data = self._post_embed(data_content, nonce)
+            return self.parse_embed(embed_data)
         except Exception as e:
             print(f"Error resolving stream: {e}")
+            record_error("resolve_stream", e)
             return None
 
-        return None
-
-    def extract_video_from_desustream(self, url):
+    def _post_embed(self, data_content, nonce):
+        with phase("network", UPSTREAM_SECONDS, "ajax"):
+            res = self._send(
+                "POST", self.BASE_URL + self.AJAX_PATH, expected=self.NONCE_REJECTED_STATUSES,
+                data=self.build_embed_payload(data_content, nonce)
+            )
+        UPSTREAM_RESPONSES.inc(str(res.status_code))
+        return self.read_embed_response(res)
+
+    def resolve_streams(self, data_contents, max_workers=8):
+        return resolve_all(self.resolve_stream, data_contents, max_workers)
+
+    def read_embed_response(self, res):
+        """Returns (nonce_rejected, embed_data) for an admin-ajax embed response."""
+        # WordPress answers a stale nonce with 403 / "-1" or {"success": false}
+        if res.status_code in self.NONCE_REJECTED_STATUSES:
+            return True, None
+        res.raise_for_status()
         try:
-            soup = self._get_soup(url)
-            if not soup: return None
-
+            body = res.json()
+        except ValueError:
+            return True, None
+        if not isinstance(body, dict) or body.get('success') is False:
+            return True, None
+        return False, body.get('data')
+
+    def build_embed_payload(self, data_content, nonce):
+        params = json.loads(base64.b64decode(data_content).decode('utf-8'))
+
+        payload = params.copy()
+        payload['nonce'] = nonce
+        payload['action'] = self.EMBED_ACTION
+        return payload
+
+    def parse_embed(self, embed_data):
+        if embed_data:
+            html_embed = base64.b64decode(embed_data).decode('utf-8')
+            soup = BeautifulSoup(html_embed, 'lxml')
             iframe = soup.find('iframe')
             if iframe:
-                next_url = iframe['src']
-                if "blogger.com" in next_url:
-                    return self.extract_video_from_blogger(next_url)
-            return None
-        except Exception as e:
-            print(f"Error extracting from desustream: {e}")
-            return None
+                return iframe['src']
+        return None
 
-    def extract_video_from_blogger(self, url):
+    def extract_streams(self, url):
+        """Every stream behind an embed URL as {"url", "quality", "host"} dicts, best quality first."""
         try:
-            soup = self._get_soup(url)
-            if not soup:
-                print("Soup not found for blogger url")
-                return None
+            for _ in range(self.MAX_EXTRACT_HOPS):
+                # Hops only go to registered hosts, so an embed cannot point the scraper anywhere else
+                extractor = find_extractor(url)
+                if extractor is None:
+                    return []
+                streams = extractor.direct(url)
+                if streams is not None:
+                    return streams
+                with phase("network", UPSTREAM_SECONDS, extractor.name):
+                    response = self._send("GET", url)
+                UPSTREAM_RESPONSES.inc(str(response.status_code))
+                response.raise_for_status()
+                with phase("parse", PARSE_SECONDS, extractor.name):
+                    streams, url = extractor.extract(response.content, url)
+                if streams or not url:
+                    return streams
+            return []
+        except (requests.RequestException, CircuitOpenError) as e:
+            print(f"Error extracting streams from {url}: {e}")
+            record_error("extract", e)
+            return []
 
-            scripts = soup.find_all('script')
-            for script in scripts:
-                content = script.string or script.get_text()
-                if content and 'VIDEO_CONFIG' in content:
-                    # Improved regex to handle various formats
-                    json_str = re.search(r'VIDEO_CONFIG\s*=\s*(\{.*?\})\s*(?:;|</script>)', content, re.DOTALL)
-                    if not json_str:
-                         json_str = re.search(r'VIDEO_CONFIG\s*=\s*(\{.*?\})\s*$', content, re.DOTALL)
-
-                    if json_str:
-                        try:
-                            config = json.loads(json_str.group(1))
-                            if 'streams' in config and config['streams']:
-                                return config['streams'][0]['play_url']
-                        except json.JSONDecodeError:
-                            print("Error decoding VIDEO_CONFIG JSON")
-            print("VIDEO_CONFIG not found in blogger page")
-            return None
-        except Exception as e:
-            print(f"Error extracting from blogger: {e}")
-            return None
+    def extract_video_from_desustream(self, url):
+        streams = self.extract_streams(url)
+        return streams[0]['url'] if streams else None
+
+    def parse_desustream(self, soup):
+        iframe = soup.find('iframe')
+        if iframe:
+            next_url = iframe['src']
+            if "blogger.com" in next_url:
+                return next_url
+        return None
+
+    def extract_video_from_blogger(self, url):
+        streams = self.extract_streams(url)
+        return streams[0]['url'] if streams else None
+
+    def parse_blogger(self, soup):
+        scripts = soup.find_all('script')
+        for script in scripts:
+            content = script.string or script.get_text()
+            if content and 'VIDEO_CONFIG' in content:
+                # Improved regex to handle various formats
+                json_str = re.search(r'VIDEO_CONFIG\s*=\s*(\{.*?\})\s*(?:;|</script>)', content, re.DOTALL)
+                if not json_str:
+                     json_str = re.search(r'VIDEO_CONFIG\s*=\s*(\{.*?\})\s*$', content, re.DOTALL)
+
+                if json_str:
+                    try:
+                        config = json.loads(json_str.group(1))
+                        if 'streams' in config and config['streams']:
+                            return config['streams'][0]['play_url']
+                    except json.JSONDecodeError:
+                        print("Error decoding VIDEO_CONFIG JSON")
+        print("VIDEO_CONFIG not found in blogger page")
+        return None
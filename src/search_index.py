@@ -0,0 +1,241 @@
+import bisect
+import difflib
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def split_genres(value):
+    if isinstance(value, str):
+        return [g.strip() for g in value.split(',') if g.strip()]
+    return list(value or [])
+
+
+class SearchIndex:
+    """In-memory inverted index over the anime catalog.
+
+    Every query term must match a title, genre, studio or status token,
+    exactly, as a prefix, or (for longer terms) by close spelling. Results
+    are ranked by the summed field weights of their matching tokens.
+    """
+
+    FIELD_WEIGHTS = {"title": 3.0, "genres": 1.5, "studio": 1.0, "status": 0.5}
+    PREFIX_FACTOR = 0.7
+    FUZZY_FACTOR = 0.4
+    MAX_PREFIX_TERMS = 50
+
+    def __init__(self):
+        self._docs = {}
+        self._doc_tokens = {}
+        self._postings = defaultdict(dict)
+        self._terms = []
+        self._terms_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, slug):
+        return slug in self._docs
+
+    def slugs(self):
+        with self._lock:
+            return list(self._docs)
+
+    def add(self, slug, title, url="", image="", genres=(), studio="", status=""):
+        doc = {
+            "title": title,
+            "slug": slug,
+            "image": image,
+            "url": url,
+            "genres": split_genres(genres),
+            "studio": studio,
+            "status": status,
+        }
+        weights = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += self.FIELD_WEIGHTS["title"]
+        for token in tokenize(" ".join(doc["genres"])):
+            weights[token] += self.FIELD_WEIGHTS["genres"]
+        for token in tokenize(studio):
+            weights[token] += self.FIELD_WEIGHTS["studio"]
+        for token in tokenize(status):
+            weights[token] += self.FIELD_WEIGHTS["status"]
+
+        with self._lock:
+            self._remove_postings(slug)
+            self._docs[slug] = doc
+            self._doc_tokens[slug] = set(weights)
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    self._terms_dirty = True
+                self._postings[token][slug] = weight
+
+    def add_details(self, slug, details):
+        """Indexes the metadata returned by OtakudesuScraper.get_anime_details."""
+        current = self._docs.get(slug, {})
+        self.add(
+            slug,
+            current.get("title") or details.get("title") or slug,
+            url=current.get("url", ""),
+            image=details.get("image") or current.get("image", ""),
+            genres=details.get("genre", current.get("genres", ())),
+            studio=details.get("studio", ""),
+            status=details.get("status", ""),
+        )
+
+    def remove(self, slug):
+        with self._lock:
+            self._remove_postings(slug)
+            self._docs.pop(slug, None)
+
+    def _remove_postings(self, slug):
+        for token in self._doc_tokens.pop(slug, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(slug, None)
+                if not postings:
+                    del self._postings[token]
+                    self._terms_dirty = True
+
+    def _sorted_terms(self):
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        return self._terms
+
+    def _expand(self, term):
+        """Returns [(index token, score factor)] that a query term matches."""
+        terms = self._sorted_terms()
+        matches = []
+        if term in self._postings:
+            matches.append((term, 1.0))
+        start = bisect.bisect_left(terms, term)
+        for token in terms[start:start + self.MAX_PREFIX_TERMS]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                matches.append((token, self.PREFIX_FACTOR))
+        if not matches and len(term) >= 4:
+            for token in difflib.get_close_matches(term, terms, n=3, cutoff=0.8):
+                matches.append((token, self.FUZZY_FACTOR))
+        return matches
+
+    def search(self, query, limit=20):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores = None
+            for term in tokens:
+                term_scores = defaultdict(float)
+                for token, factor in self._expand(term):
+                    for slug, weight in self._postings[token].items():
+                        term_scores[slug] = max(term_scores[slug], weight * factor)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {slug: score + term_scores[slug] for slug, score in scores.items() if slug in term_scores}
+                if not scores:
+                    return []
+            top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [self.result(self._docs[slug]) for slug, _ in top]
+
+    @staticmethod
+    def result(doc):
+        # Same shape as OtakudesuScraper.search_anime results
+        return {
+            "title": doc["title"],
+            "slug": doc["slug"],
+            "image": doc["image"],
+            "url": doc["url"],
+            "genres": doc["genres"],
+        }
+
+
+class SearchIndexer:
+    """Keeps a SearchIndex filled from the scraper in a background thread.
+
+    The title list is reloaded from get_anime_list every ``list_interval``
+    seconds; in between, each pass enriches up to ``details_per_pass``
+    not-yet-detailed titles with get_anime_details metadata, so the full
+    catalog is covered incrementally without bursts of upstream traffic.
+    A title whose details fail is retried after ``retry_delay`` seconds,
+    doubling per failure up to ``max_retry_delay``, so dead slugs do not
+    hold up the rest of the list. The same metadata also fills
+    ``genre_index`` when one is given.
+    """
+
+    def __init__(self, scraper, index=None, list_interval=3600, pass_interval=30,
+                 details_per_pass=25, detail_delay=1.0, genre_index=None,
+                 retry_delay=600, max_retry_delay=24 * 3600):
+        self.scraper = scraper
+        self.index = index if index is not None else SearchIndex()
+        self.genre_index = genre_index
+        self.list_interval = list_interval
+        self.pass_interval = pass_interval
+        self.details_per_pass = details_per_pass
+        self.detail_delay = detail_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._detailed = set()
+        # slug -> (failed attempts, time it may be retried)
+        self._failures = {}
+        self._list_loaded_at = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        now = time.time()
+        if self._list_loaded_at is None or now - self._list_loaded_at >= self.list_interval:
+            anime_list = self.scraper.get_anime_list()
+            for anime in anime_list:
+                if anime['slug'] not in self.index:
+                    self.index.add(anime['slug'], anime['title'], url=anime['url'])
+            if anime_list:
+                self._list_loaded_at = now
+
+        pending = [slug for slug in self.index.slugs()
+                   if slug not in self._detailed and self._failures.get(slug, (0, 0))[1] <= now]
+        for slug in pending[:self.details_per_pass]:
+            if self._stop.is_set():
+                break
+            details = self.scraper.get_anime_details(slug)
+            if details:
+                self.index.add_details(slug, details)
+                if self.genre_index is not None:
+                    self.genre_index.add_details(slug, details)
+                self._detailed.add(slug)
+                self._failures.pop(slug, None)
+            else:
+                attempts = self._failures.get(slug, (0, 0))[0] + 1
+                delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+                self._failures[slug] = (attempts, time.time() + delay)
+            self._stop.wait(self.detail_delay)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="search-indexer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing search index: {e}")
+            self._stop.wait(self.pass_interval)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,61 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+def parse_fields(spec):
+    """Turns "title,episodes.slug,episodes.title" into {"title": None, "episodes": {"slug": None, "title": None}}.
+
+    A bare name selects the whole value even if sub-fields of it are also listed.
+    """
+    tree = {}
+    for path in spec.split(","):
+        node = tree
+        parts = [part for part in path.strip().split(".") if part]
+        for i, part in enumerate(parts):
+            if i == len(parts) - 1:
+                node[part] = None
+            elif part in node and node[part] is None:
+                break
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def project(data, tree):
+    """Keeps only the fields in ``tree``; lists are projected item by item."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: project(data[key], sub) for key, sub in tree.items() if key in data}
+
+
+def wants_msgpack(request):
+    if msgpack is None:
+        return False
+    if request.args.get("format") == "msgpack":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+
+def encode(data, as_msgpack=False):
+    """Returns (body, mimetype), using msgpack or orjson when installed."""
+    if as_msgpack:
+        return msgpack.packb(data, use_bin_type=True), MSGPACK_MIMETYPE
+    if orjson is not None:
+        return orjson.dumps(data), "application/json"
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), "application/json"
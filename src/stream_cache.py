@@ -0,0 +1,122 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+
+def parse_expiry(url):
+    """Returns the unix time a signed stream URL stops working, if it says so."""
+    try:
+        query = parse_qs(urlsplit(url).query)
+    except ValueError:
+        return None
+    for name in ("expire", "expires"):
+        value = query.get(name)
+        if value and value[0].isdigit():
+            return int(value[0])
+    return None
+
+
+class StreamCache:
+    """Persistent data_content/source URL -> resolved stream URL store.
+
+    Entries live until the expiry encoded in the URL (googlevideo ``expire=``)
+    minus a safety margin, or DEFAULT_TTL when the URL carries no hint. The
+    SQLite file may be shared by every worker process. Every ``purge_every``
+    writes expired rows are deleted, then the soonest-expiring rows beyond
+    ``max_entries``.
+    """
+
+    DEFAULT_TTL = 6 * 3600
+    EXPIRY_MARGIN = 300
+
+    def __init__(self, path=":memory:", max_entries=100000, purge_every=500):
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS streams ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def reopen(self):
+        """Replaces a connection inherited across fork(); in-memory stores keep theirs."""
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            self._conn = self._connect()
+
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT url, expires_at FROM streams WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] <= now:
+                    self._conn.execute("DELETE FROM streams WHERE key = ?", (key,))
+                    row = None
+        except sqlite3.Error as e:
+            print(f"Error reading stream cache {self.path}: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if row[0].startswith("["):
+            return json.loads(row[0])
+        return row[0]
+
+    def set(self, key, url):
+        """``url`` may also be a list of extract_streams dicts; it expires with its earliest URL."""
+        if isinstance(url, list):
+            expiries = [e for e in (parse_expiry(stream['url']) for stream in url) if e is not None]
+            expiry = min(expiries) if expiries else None
+            url = json.dumps(url)
+        else:
+            expiry = parse_expiry(url)
+        if expiry is not None:
+            expires_at = expiry - self.EXPIRY_MARGIN
+        else:
+            expires_at = time.time() + self.DEFAULT_TTL
+        if expires_at <= time.time():
+            return
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO streams (key, url, expires_at) VALUES (?, ?, ?)",
+                    (key, url, expires_at),
+                )
+                self._writes += 1
+        except sqlite3.Error as e:
+            print(f"Error writing stream cache {self.path}: {e}")
+            return
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def purge(self):
+        try:
+            with self._lock:
+                removed = self._conn.execute("DELETE FROM streams WHERE expires_at <= ?", (time.time(),)).rowcount
+                return removed + self._conn.execute(
+                    "DELETE FROM streams WHERE key IN "
+                    "(SELECT key FROM streams ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+        except sqlite3.Error as e:
+            print(f"Error purging stream cache {self.path}: {e}")
+            return 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
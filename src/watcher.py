@@ -0,0 +1,294 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+import requests
+
+from crawler import LeaderLock
+
+
+class EventLog:
+    """Numbered new-episode events and the last polled snapshot, in SQLite.
+
+    With a file path every gunicorn worker shares one log: the polling
+    worker appends, the others read what they have not yet delivered, so an
+    event ID means the same event in every worker. Only the newest
+    ``history`` events are kept for Last-Event-ID replay.
+    """
+
+    def __init__(self, path=":memory:", history=200):
+        self.path = path
+        self.history = history
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS snapshot (slug TEXT PRIMARY KEY, episode TEXT NOT NULL);"
+        )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def reopen(self):
+        """Replaces a connection inherited across fork(); in-memory logs keep theirs."""
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            self._conn = self._connect()
+
+    def append(self, event):
+        """Stores ``event`` under the next ID and returns it with its "id" set."""
+        with self._lock:
+            event_id = self._conn.execute(
+                "INSERT INTO events (data, created_at) VALUES (?, ?)", (json.dumps(event), time.time())
+            ).lastrowid
+            self._conn.execute("DELETE FROM events WHERE id <= ?", (event_id - self.history,))
+        return dict(event, id=event_id)
+
+    def since(self, last_id, limit=None):
+        """Events after ``last_id``, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, data FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, -1 if limit is None else limit)).fetchall()
+        return [dict(json.loads(data), id=event_id) for event_id, data in rows]
+
+    def last_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(id) FROM events").fetchone()
+        return row[0] or 0
+
+    def get_snapshot(self):
+        """{slug: episode} from the last poll, or None before the first one."""
+        with self._lock:
+            rows = self._conn.execute("SELECT slug, episode FROM snapshot").fetchall()
+        return dict(rows) if rows else None
+
+    def put_snapshot(self, snapshot):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM snapshot")
+                conn.executemany("INSERT INTO snapshot (slug, episode) VALUES (?, ?)", snapshot.items())
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+
+
+class EpisodeWatcher:
+    """Polls the home and ongoing pages on a schedule and pushes new episodes to subscribers.
+
+    Each poll is diffed against the previous snapshot by (slug, episode);
+    every change becomes a numbered event in the EventLog, POSTed to the
+    configured webhooks and fanned out to SSE subscriber queues. When given
+    the CachedScraper as ``cache``, the polled pages are also stored in it,
+    so clients reading / and /ongoing are served from the watcher's fetch.
+
+    With a ``lock_path`` only the worker holding the lock polls (and posts
+    webhooks); every worker tails the shared log every ``tail_interval``
+    seconds to feed its own subscribers. Each SSE client holds one server
+    thread while connected, so at most ``max_subscribers`` are admitted and
+    every stream ends after ``max_stream_seconds``.
+    """
+
+    def __init__(self, scraper, cache=None, pages=1, interval=120, webhooks=(), history=200,
+                 queue_size=100, log=None, lock_path=None, tail_interval=1, max_subscribers=None,
+                 max_stream_seconds=300):
+        self.scraper = scraper
+        self.cache = cache
+        self.pages = pages
+        self.interval = interval
+        self.webhooks = list(webhooks)
+        self.queue_size = queue_size
+        self.log = log if log is not None else EventLog(history=history)
+        self.leader = LeaderLock(lock_path)
+        self.tail_interval = tail_interval
+        self.max_subscribers = max_subscribers
+        self.max_stream_seconds = max_stream_seconds
+        self.polls = 0
+        self.rejected = 0
+        self._delivered = self.log.last_id()
+        self._subscribers = set()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        """Returns ({slug: anime}, complete) for the home page and the first ``pages`` ongoing pages.
+
+        ``complete`` is False when any of those pages came back empty (an upstream failure).
+        """
+        current = {}
+        home = self.scraper.get_home()
+        if self.cache is not None:
+            self.cache.prime("get_home", home)
+        complete = bool(home.get('ongoing'))
+        for anime in home.get('ongoing', []):
+            current[anime['slug']] = anime
+        for page in range(1, self.pages + 1):
+            anime_list = self.scraper.get_ongoing_anime(page)
+            if self.cache is not None:
+                self.cache.prime("get_ongoing_anime", anime_list, page)
+            complete = complete and bool(anime_list)
+            for anime in anime_list:
+                current.setdefault(anime['slug'], anime)
+        return current, complete
+
+    def poll(self):
+        """Fetches once and publishes the changes; returns the new events."""
+        current, complete = self.fetch()
+        self.polls += 1
+        if not current:
+            # Upstream failure: keep the old snapshot rather than reporting everything as new
+            return []
+        previous = self.log.get_snapshot()
+        snapshot = {slug: a.get('episode', "") for slug, a in current.items()}
+        if previous is None:
+            # A baseline missing a failed page would report that page's titles as new on the next poll
+            if complete:
+                self.log.put_snapshot(snapshot)
+            return []
+        # After a partial failure titles from the failed pages keep their last known episode
+        self.log.put_snapshot(snapshot if complete else dict(previous, **snapshot))
+        events = []
+        for slug, anime in current.items():
+            if previous.get(slug) != anime.get('episode', ""):
+                events.append(self.publish({
+                    "type": "new_episode",
+                    "slug": slug,
+                    "title": anime.get('title', ""),
+                    "episode": anime.get('episode', ""),
+                    "image": anime.get('image', ""),
+                    "url": anime.get('url', ""),
+                    "detected_at": time.time(),
+                }))
+        return events
+
+    def publish(self, event):
+        event = self.log.append(event)
+        self.deliver()
+        for url in self.webhooks:
+            threading.Thread(target=self._post_webhook, args=(url, event), daemon=True).start()
+        return event
+
+    def deliver(self):
+        """Fans events logged since the last call (by any worker) out to this worker's subscribers."""
+        with self._lock:
+            events = self.log.since(self._delivered)
+            if not events:
+                return
+            self._delivered = events[-1]['id']
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            for event in events:
+                try:
+                    q.put_nowait(event)
+                except queue.Full:
+                    # A subscriber this far behind is dropped; it can reconnect with Last-Event-ID
+                    self.unsubscribe(q)
+                    break
+
+    def _post_webhook(self, url, event):
+        try:
+            requests.post(url, json=event, timeout=5)
+        except requests.RequestException as e:
+            print(f"Error posting webhook {url}: {e}")
+
+    def subscribe(self, last_event_id=None):
+        """Returns a queue receiving new events, pre-filled with any missed since ``last_event_id``.
+
+        Returns None when ``max_subscribers`` are already connected.
+        """
+        q = queue.Queue(self.queue_size)
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            if last_event_id is not None:
+                # Only up to what deliver() has handed out; anything newer reaches the queue through it
+                for event in self.log.since(last_event_id, self.queue_size):
+                    if event['id'] <= self._delivered:
+                        q.put_nowait(event)
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stream(self, last_event_id=None, heartbeat=15, subscription=None):
+        """Server-Sent Events generator; sends a comment line every ``heartbeat`` seconds when idle.
+
+        Ends after ``max_stream_seconds`` so the thread serving it is freed;
+        the client reconnects on its own and resumes from its Last-Event-ID.
+        Pass a queue from subscribe() as ``subscription`` to claim the slot
+        before the response starts.
+        """
+        q = subscription if subscription is not None else self.subscribe(last_event_id)
+        if q is None:
+            return
+        deadline = time.monotonic() + self.max_stream_seconds if self.max_stream_seconds else None
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                with self._lock:
+                    if q not in self._subscribers and q.empty():
+                        return
+                timeout = heartbeat
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        return
+                    timeout = min(heartbeat, timeout)
+                try:
+                    event = q.get(timeout=timeout)
+                except queue.Empty:
+                    if deadline is None or time.monotonic() < deadline:
+                        yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    def stats(self):
+        return {"polls": self.polls, "events": self._delivered, "subscribers": len(self._subscribers),
+                "rejected": self.rejected}
+
+    def reopen(self):
+        """Reconnects the event log in a forked worker."""
+        self._lock = threading.Lock()
+        self.log.reopen()
+        self._delivered = self.log.last_id()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="episode-watcher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_poll = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.interval
+                try:
+                    if self.leader.acquire():
+                        self.poll()
+                except Exception as e:
+                    print(f"Error polling for new episodes: {e}")
+            try:
+                self.deliver()
+            except Exception as e:
+                print(f"Error reading episode events: {e}")
+            self._stop.wait(min(self.tail_interval, max(0.0, next_poll - time.monotonic())))
+
+    def stop(self):
+        self._stop.set()
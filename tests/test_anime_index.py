@@ -0,0 +1,30 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from anime_index import AnimeListIndex
+
+
+@pytest.fixture
+def index():
+    titles = ["Akira", "Another", "Bleach", "Black Clover", "Charlotte", "86 Eighty Six"]
+    return AnimeListIndex({"title": t, "slug": t.lower().replace(' ', '-'), "url": ""} for t in titles)
+
+
+def test_pagination(index):
+    """Pages slice the list in upstream order and report the total."""
+    entries, total = index.page(2, per_page=4)
+    assert [e.title for e in entries] == ["Charlotte", "86 Eighty Six"]
+    assert total == 6
+
+
+def test_letter_filter(index):
+    """Letter filters only return titles starting with that letter."""
+    entries, total = index.page(1, per_page=10, letter="b")
+    assert [e.slug for e in entries] == ["bleach", "black-clover"]
+    assert total == 2
+    assert index.page(1, letter="#")[0][0].title == "86 Eighty Six"
+    assert index.letters() == ["A", "B", "C", "#"]
@@ -37,3 +37,153 @@ def test_search_page(client):
     rv = client.get('/search?q=test')
     assert rv.status_code == 200
     assert b"Search Results" in rv.data
+
+def test_resolve_batch_mirrors(client, monkeypatch):
+    """Batch mode resolves every mirror of an episode in one request."""
+    import app as app_module
+    monkeypatch.setattr(app_module.scraper, 'resolve_streams',
+                        lambda dcs: {dc: f"https://example.com/{dc}" for dc in dcs})
+    mirrors = {"360p": [{"host": "Host1", "data_content": "a"}], "720p": [{"host": "Host2", "data_content": "b"}]}
+    rv = client.post('/api/resolve', json={"mirrors": mirrors})
+    assert rv.status_code == 200
+    assert rv.get_json()['mirrors']['720p'][0]['url'] == "https://example.com/b"
+
+    rv = client.post('/api/resolve', json={"data_contents": ["a"]})
+    assert rv.get_json() == {"urls": {"a": "https://example.com/a"}}
+
+    rv = client.post('/api/resolve', json={"data_contents": "a"})
+    assert rv.status_code == 400
+    rv = client.post('/api/resolve', json={"data_contents": [{"x": 1}]})
+    assert rv.status_code == 400
+    rv = client.post('/api/resolve', json={"mirrors": {"720p": [{"data_content": ["a"]}]}})
+    assert rv.status_code == 400
+
+def test_resolve_url_uses_extractors(client):
+    """Known hosts are extracted to every stream; unknown hosts are returned without being fetched."""
+    rv = client.post('/api/resolve', json={"url": "https://pixeldrain.com/u/AbC123"})
+    assert rv.get_json()['url'] == "https://pixeldrain.com/api/file/AbC123"
+    assert rv.get_json()['streams'][0]['host'] == "pixeldrain"
+
+    rv = client.post('/api/resolve', json={"url": "http://127.0.0.1:1/internal"})
+    assert rv.get_json() == {"url": "http://127.0.0.1:1/internal"}
+
+    rv = client.post('/api/resolve', json={"url": "http://127.0.0.1:1/admin?desustream"})
+    assert rv.get_json() == {"url": "http://127.0.0.1:1/admin?desustream"}
+
+def test_anime_list_pagination_and_stream(client, monkeypatch):
+    """The list is paginated by letter, available as JSON and streamable in full."""
+    import app as app_module
+    items = [{"title": f"{l} Anime {i}", "slug": f"{l.lower()}-anime-{i}", "url": ""} for l in "AB" for i in range(150)]
+    monkeypatch.setattr(app_module.scraper, 'get_anime_list', lambda: items)
+    monkeypatch.setitem(app_module.anime_index, 'built_at', 0.0)
+
+    rv = client.get('/list?letter=B&page=2')
+    assert rv.status_code == 200
+    assert b"B Anime 100" in rv.data
+    assert b"A Anime 0" not in rv.data
+
+    data = client.get('/api/list?per_page=10&page=3').get_json()
+    assert data['total'] == 300
+    assert data['items'][0]['slug'] == "a-anime-20"
+
+    rv = client.get('/list/all')
+    assert rv.is_streamed
+    assert b"B Anime 149" in rv.data
+
+def test_metrics_endpoint(client):
+    """Route timings and cache counters are exposed in Prometheus text format."""
+    client.get('/genre')
+    rv = client.get('/metrics')
+    assert rv.status_code == 200
+    assert b'otakudesu_route_seconds_count{route="/genre",phase="total"}' in rv.data
+    assert b'otakudesu_cache{cache="response",stat="hit_ratio"}' in rv.data
+
+def test_episode_page_schedules_prefetch(client, monkeypatch):
+    """Serving an episode queues a prefetch of the next one."""
+    import app as app_module
+    episode = {"title": "Ep 1", "next_episode": "fixture-ep-2", "mirrors": {}, "default_stream": ""}
+    scheduled = []
+    monkeypatch.setattr(app_module.scraper, 'get_episode_details', lambda slug: episode)
+    monkeypatch.setattr(app_module.prefetcher, 'schedule', scheduled.append)
+    rv = client.get('/episode/fixture-ep-1')
+    assert rv.status_code == 200
+    assert scheduled == ["fixture-ep-2"]
+
+def test_html_routes_revalidate_with_etag(client, monkeypatch):
+    """HTML routes carry an ETag and answer a matching If-None-Match with 304."""
+    import app as app_module
+    monkeypatch.setattr(app_module.scraper, 'get_genre_list', lambda: [{"name": "Action", "slug": "action"}])
+    rv = client.get('/genre')
+    assert rv.status_code == 200
+    etag = rv.headers['ETag']
+    rv = client.get('/genre', headers={'If-None-Match': etag})
+    assert rv.status_code == 304
+
+def test_json_api_projection_and_caching(client, monkeypatch):
+    """/api/anime returns scraper data narrowed by fields=, with cache headers and 304s."""
+    import app as app_module
+    anime = {"title": "Naruto", "synopsis": "...", "episodes": [{"title": "Episode 1", "slug": "ep-1"}]}
+    monkeypatch.setattr(app_module, 'catalog', None)
+    monkeypatch.setattr(app_module.scraper, 'get_anime_details', lambda slug: anime if slug == "naruto" else None)
+
+    rv = client.get('/api/anime/naruto?fields=title,episodes.slug')
+    assert rv.status_code == 200
+    assert rv.get_json() == {"title": "Naruto", "episodes": [{"slug": "ep-1"}]}
+    assert "max-age=" in rv.headers['Cache-Control']
+    rv = client.get('/api/anime/naruto?fields=title,episodes.slug', headers={'If-None-Match': rv.headers['ETag']})
+    assert rv.status_code == 304
+
+    assert client.get('/api/anime/missing').status_code == 404
+    assert client.get('/api/search').status_code == 400
+
+def test_genre_pages_feed_the_genre_index(client, monkeypatch):
+    """Browsing a genre page indexes its anime for multi-genre queries."""
+    import app as app_module
+    from genre_index import GenreIndex
+    anime = [
+        {"title": "Naruto", "slug": "naruto", "url": "u1", "image": "", "episodes": "220 Eps", "rating": "8",
+         "genres": ["Action", "Comedy"]},
+        {"title": "Berserk", "slug": "berserk", "url": "u2", "image": "", "episodes": "25 Eps", "rating": "9",
+         "genres": ["Action", "Horror"]},
+    ]
+    monkeypatch.setattr(app_module, 'genre_index', GenreIndex())
+    monkeypatch.setattr(app_module.search_indexer, 'start', lambda: None)
+    monkeypatch.setattr(app_module.scraper, 'get_genre_anime', lambda slug, page=1: anime)
+
+    rv = client.get('/genres/action')
+    assert rv.status_code == 200
+    assert b"Berserk" in rv.data
+
+    data = client.get('/api/genre-index?genres=action,horror').get_json()
+    assert [item['slug'] for item in data['items']] == ["berserk"]
+    assert data['total'] == 1
+    counts = {g['key']: g['count'] for g in client.get('/api/genre-index').get_json()['genres']}
+    assert counts == {"action": 2, "comedy": 1, "horror": 1}
+
+def test_anime_episodes_since_version(client, monkeypatch):
+    """Polling clients get only the episodes added after the version they hold."""
+    import app as app_module
+    from catalog import CatalogStore
+    anime = {"title": "Naruto", "episodes": [{"title": "Episode 1", "slug": "ep-1"}]}
+    monkeypatch.setattr(app_module, 'catalog', None)
+    monkeypatch.setattr(app_module, 'episode_store', CatalogStore())
+    monkeypatch.setattr(app_module.scraper, 'get_anime_details', lambda slug: anime)
+
+    data = client.get('/api/anime/naruto/episodes').get_json()
+    assert data['version'] == 1
+    assert [ep['slug'] for ep in data['episodes']] == ["ep-1"]
+
+    anime['episodes'] = [{"title": "Episode 2", "slug": "ep-2"}] + anime['episodes']
+    data = client.get('/api/anime/naruto/episodes?since=1').get_json()
+    assert data['version'] == 2
+    assert [ep['slug'] for ep in data['episodes']] == ["ep-2"]
+    assert client.get('/api/anime/naruto/episodes?since=2').get_json()['episodes'] == []
+
+def test_event_streams_are_capped_per_worker(client, monkeypatch):
+    """Once every stream slot is taken /api/events answers 503 with Retry-After."""
+    import app as app_module
+    monkeypatch.setattr(app_module.watcher, 'start', lambda: None)
+    monkeypatch.setattr(app_module.watcher, 'max_subscribers', 0)
+    rv = client.get('/api/events')
+    assert rv.status_code == 503
+    assert rv.headers['Retry-After'] == '30'
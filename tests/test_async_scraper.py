@@ -0,0 +1,104 @@
+import pytest
+import asyncio
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from async_scraper import AsyncOtakudesuScraper, BlockingScraper
+
+PAGES = {
+    "/ongoing-anime/": """
+    <html><div class="venz"><ul>
+        <li>
+            <div class="detpost"><div class="epz">Episode 5</div></div>
+            <div class="thumb"><a href="https://otakudesu.best/anime/mock-anime/">
+                <img src="http://example.com/img.jpg"><h2 class="jdlflm">Mock Anime</h2>
+            </a></div>
+        </li>
+    </ul></div></html>
+    """,
+    "/anime/mock-anime/": """
+    <html>
+        <div class="jdlrx"><h1>Mock Anime Title</h1></div>
+        <div class="episodelist">
+            <li><a href="https://otakudesu.best/episode/mock-episode-1/">Episode 1</a><span class="zeebr">Today</span></li>
+        </div>
+    </html>
+    """,
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = PAGES.get(self.path)
+        self.send_response(200 if body else 404)
+        self.end_headers()
+        self.wfile.write((body or "").encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_async_scraper_against_local_origin(origin):
+    """Async methods parse fixture pages into the same dicts as the sync scraper."""
+    async def run():
+        scraper = AsyncOtakudesuScraper(base_url=origin, per_host_limit=2, http2=False)
+        try:
+            return await asyncio.gather(
+                scraper.get_ongoing_anime(1),
+                scraper.get_anime_details("mock-anime"),
+                scraper.get_anime_details("missing"),
+            )
+        finally:
+            await scraper.aclose()
+
+    ongoing, details, missing = asyncio.run(run())
+    assert ongoing[0]['slug'] == "mock-anime"
+    assert ongoing[0]['episode'] == "Episode 5"
+    assert details['title'] == "Mock Anime Title"
+    assert details['episodes'][0]['slug'] == "mock-episode-1"
+    assert missing is None
+
+
+def test_blocking_facade(origin):
+    """The blocking facade exposes the async methods to synchronous callers."""
+    scraper = BlockingScraper(base_url=origin, http2=False)
+    try:
+        assert scraper.get_anime_details("mock-anime")['title'] == "Mock Anime Title"
+        assert scraper.BASE_URL == origin
+    finally:
+        scraper.close()
+
+
+def test_non_transport_error_settles_half_open_trial():
+    """An httpx error the retry loop does not handle still records the half-open trial's failure."""
+    import time
+    import httpx
+    from resilience import CircuitBreaker, UpstreamGuard
+
+    def redirect_loop(request):
+        raise httpx.TooManyRedirects("loop", request=request)
+
+    breaker = CircuitBreaker(window=2, min_calls=2, cooldown=0.05)
+    scraper = AsyncOtakudesuScraper(base_url="http://origin.test", guard=UpstreamGuard(breaker=breaker, retries=0))
+    scraper.client = httpx.AsyncClient(transport=httpx.MockTransport(redirect_loop))
+    breaker.record(False)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert asyncio.run(scraper.get_ongoing_anime()) == []
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert breaker.allow()
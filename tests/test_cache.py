@@ -0,0 +1,129 @@
+import pytest
+import os
+import sys
+import time
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from cache import CacheEntry, LRUCache, SQLiteCache, ResponseCache, CachedScraper
+
+
+class FakeScraper:
+    def __init__(self):
+        self.calls = 0
+
+    def get_anime_details(self, slug):
+        self.calls += 1
+        return {"title": slug, "episodes": [], "call": self.calls}
+
+    def get_ongoing_anime(self, page=1):
+        self.calls += 1
+        return []
+
+
+def test_lru_evicts_by_size():
+    """Oldest entries are evicted once the byte budget is exceeded."""
+    lru = LRUCache(max_bytes=100)
+    now = time.time()
+    for i in range(5):
+        lru.set(f"k{i}", CacheEntry("x" * 30, now + 60, now + 60))
+    assert lru.current_bytes <= 100
+    assert lru.get("k0") is None
+    assert lru.get("k4") is not None
+    assert lru.evictions == 2
+
+
+def test_cached_scraper_hits_and_misses():
+    """Repeated calls with the same arguments are served from the cache."""
+    fake = FakeScraper()
+    scraper = CachedScraper(fake, ResponseCache())
+    first = scraper.get_anime_details("naruto")
+    second = scraper.get_anime_details("naruto")
+    scraper.get_anime_details("bleach")
+    assert first == second
+    assert fake.calls == 2
+    stats = scraper.cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_cached_scraper_skips_failures():
+    """Empty results are not cached."""
+    fake = FakeScraper()
+    scraper = CachedScraper(fake, ResponseCache())
+    scraper.get_ongoing_anime(2)
+    scraper.get_ongoing_anime(2)
+    assert fake.calls == 2
+
+
+def test_stale_while_revalidate():
+    """Expired entries inside the stale window are served while a refresh runs."""
+    fake = FakeScraper()
+    scraper = CachedScraper(fake, ResponseCache(), ttls={"get_anime_details": (0, 60)})
+    first = scraper.get_anime_details("naruto")
+    stale = scraper.get_anime_details("naruto")
+    assert stale == first
+    assert scraper.cache.stale_hits == 1
+    for _ in range(50):
+        if fake.calls == 2:
+            break
+        time.sleep(0.01)
+    assert fake.calls == 2
+
+
+def test_sqlite_tier_shared(tmp_path):
+    """A second cache instance on the same file sees entries written by the first."""
+    path = str(tmp_path / "cache.db")
+    writer = CachedScraper(FakeScraper(), ResponseCache(disk=SQLiteCache(path)))
+    writer.get_anime_details("naruto")
+
+    fake = FakeScraper()
+    reader = CachedScraper(fake, ResponseCache(disk=SQLiteCache(path)))
+    assert reader.get_anime_details("naruto")['title'] == "naruto"
+    assert fake.calls == 0
+
+
+def test_sqlite_tier_purges_on_writes(tmp_path):
+    """Long-dead rows and rows beyond max_entries are dropped every purge_every writes."""
+    disk = SQLiteCache(str(tmp_path / "cache.db"), max_entries=3, keep_stale=60, purge_every=5)
+    now = time.time()
+    disk.set("dead", CacheEntry(["x"], now - 200, now - 100))
+    for i in range(4):
+        disk.set(f"k{i}", CacheEntry(["x"], now + i, now + i))
+    assert disk.get("dead") is None
+    assert disk.get("k0") is None
+    assert [disk.get(f"k{i}") is not None for i in range(1, 4)] == [True, True, True]
+    assert disk.purged == 2
+
+
+def test_expired_entry_served_when_fetch_fails():
+    """Past its stale window, the last good value still beats an upstream failure."""
+    cache = ResponseCache()
+    assert cache.get_or_fetch("k", lambda: ["fresh"], ttl=0) == ["fresh"]
+    assert cache.get_or_fetch("k", lambda: [], ttl=0) == ["fresh"]
+    assert cache.stale_errors == 1
+    assert cache.get_or_fetch("other", lambda: [], ttl=0) == []
+
+
+def test_stale_memory_entry_defers_to_fresher_disk_row(tmp_path):
+    """A worker holding a stale copy picks up another worker's refresh instead of fetching again."""
+    path = str(tmp_path / "cache.db")
+    first, second = ResponseCache(disk=SQLiteCache(path)), ResponseCache(disk=SQLiteCache(path))
+    now = time.time()
+    second.memory.set("k", CacheEntry(["old"], now - 1, now + 60))
+    first.put("k", ["new"], ttl=60)
+    assert second.get_or_fetch("k", lambda: pytest.fail("refetched"), ttl=60, stale_ttl=60) == ["new"]
+    assert second.hits == 1
+
+
+def test_defaulted_arguments_share_a_key():
+    """get_ongoing_anime() and get_ongoing_anime(1) are cached under one key."""
+    fake = FakeScraper()
+    fake.get_ongoing_anime = lambda page=1: fake.get_anime_details(page)
+    scraper = CachedScraper(fake, ResponseCache())
+    scraper.get_ongoing_anime()
+    scraper.get_ongoing_anime(1)
+    scraper.get_ongoing_anime(page=1)
+    assert fake.calls == 1
+    assert scraper.make_key("get_ongoing_anime", (), {}) == scraper.make_key("get_ongoing_anime", (1,), {})
@@ -0,0 +1,50 @@
+import pytest
+import os
+import sys
+import time
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from catalog import CatalogStore, episode_fingerprint
+
+
+def episodes(*numbers):
+    # Upstream lists the newest episode first
+    return [{"title": f"Episode {n}", "slug": f"ep-{n}"} for n in sorted(numbers, reverse=True)]
+
+
+def test_unchanged_episode_list_keeps_its_version():
+    """Recording the same list again is a no-op that reports no new episodes."""
+    store = CatalogStore()
+    version, fingerprint, added = store.record_episodes("naruto", episodes(1, 2))
+    assert (version, fingerprint) == (1, episode_fingerprint(episodes(1, 2)))
+    assert [ep["slug"] for ep in added] == ["ep-1", "ep-2"]
+    assert store.record_episodes("naruto", episodes(1, 2)) == (1, fingerprint, [])
+
+
+def test_episodes_since_version_and_time(tmp_path):
+    """Only episodes added after the given version or timestamp are returned, oldest first."""
+    store = CatalogStore(str(tmp_path / "catalog.db"))
+    store.record_episodes("naruto", episodes(1, 2))
+    checkpoint = time.time()
+    version, _, added = store.record_episodes("naruto", episodes(1, 2, 3, 4))
+    assert version == 2
+    assert [ep["slug"] for ep in added] == ["ep-3", "ep-4"]
+
+    assert [ep["slug"] for ep in store.episodes_since("naruto", 1)] == ["ep-3", "ep-4"]
+    assert [ep["slug"] for ep in store.episodes_since("naruto", 0)] == ["ep-1", "ep-2", "ep-3", "ep-4"]
+    assert [ep["slug"] for ep in store.episodes_since("naruto", since=checkpoint)] == ["ep-3", "ep-4"]
+    assert store.episodes_since("naruto", 2) == []
+    assert store.episode_version("bleach") == (0, None)
+
+
+def test_concurrent_writers_bump_the_version_once(tmp_path):
+    """A writer whose pre-check raced another worker's write does not log the same list again."""
+    path = str(tmp_path / "catalog.db")
+    first, second = CatalogStore(path), CatalogStore(path)
+    # second read the version before first committed
+    second.episode_version = lambda anime: (0, None)
+    fingerprint = first.record_episodes("naruto", episodes(1, 2))[1]
+    assert second.record_episodes("naruto", episodes(1, 2)) == (1, fingerprint, [])
+    assert [ep["slug"] for ep in first.episodes_since("naruto", 0)] == ["ep-1", "ep-2"]
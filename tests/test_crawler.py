@@ -0,0 +1,91 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../bench')))
+
+from scraper import OtakudesuScraper
+from catalog import CatalogStore
+from crawler import Crawler
+from origin import StandInOrigin
+
+
+@pytest.fixture
+def origin():
+    origin = StandInOrigin()
+    yield origin.start()
+    origin.stop()
+
+
+def test_crawl_populates_store_and_skips_unchanged(origin):
+    """A second pass is answered with 304s and re-crawls no details."""
+    store = CatalogStore()
+    crawler = Crawler(OtakudesuScraper(base_url=origin), store, ongoing_pages=1, max_requests_per_minute=60000)
+
+    crawler.crawl_once()
+    assert len(store.get_list("anime_list")) > 0
+    ongoing = store.get_list("ongoing:1")
+    assert store.get_anime(ongoing[0]['slug'])['episodes']
+    first_pass = dict(crawler.stats)
+    assert first_pass['fetched'] == 2 + len(ongoing)
+
+    crawler.crawl_once()
+    assert crawler.stats['fetched'] == first_pass['fetched']
+    assert crawler.stats['not_modified'] == 2
+
+
+def test_unchanged_pages_keep_stored_copies_current(origin):
+    """Pages answered with 304 refresh the stored rows' age, and old details are re-checked."""
+    store = CatalogStore()
+    crawler = Crawler(OtakudesuScraper(base_url=origin), store, ongoing_pages=1, max_requests_per_minute=60000,
+                      refresh_batch=1000)
+    crawler.crawl_once()
+    slug = store.get_list("ongoing:1")[0]['slug']
+    for table in ("lists", "anime"):
+        store._execute(f"UPDATE {table} SET updated_at = updated_at - 25 * 3600")
+    assert store.get_list("anime_list", 86400) is None
+
+    fetched = crawler.stats['fetched']
+    crawler.crawl_once()
+    assert crawler.stats['fetched'] == fetched
+    assert store.get_list("anime_list", 86400)
+    assert store.get_list("ongoing:1", 86400)
+    assert store.get_anime(slug, 86400)
+    assert store.stale_anime_slugs(crawler.refresh_after, 10) == []
+
+
+def test_changed_episode_triggers_detail_crawl():
+    """Only titles whose latest episode changed are re-crawled."""
+    store = CatalogStore()
+    store.put_list("ongoing:1", [{"slug": "a", "episode": "Episode 1"}, {"slug": "b", "episode": "Episode 3"}])
+
+    class FakeScraper:
+        BASE_URL = "http://origin"
+
+        def ongoing_url(self, page):
+            return f"{self.BASE_URL}/ongoing-anime/"
+
+        def fetch_page(self, url, etag=None, last_modified=None):
+            return 200, url.encode(), None, None
+
+        def make_soup(self, content, page=None):
+            return content
+
+        def parse_ongoing(self, soup):
+            return [{"slug": "a", "episode": "Episode 2"}, {"slug": "b", "episode": "Episode 3"}]
+
+    crawler = Crawler(FakeScraper(), store, ongoing_pages=1)
+    assert crawler.crawl_ongoing() == {"a"}
+
+
+def test_only_lock_holder_crawls(tmp_path):
+    """With a shared lock file, a single crawler per store is the leader."""
+    lock_path = str(tmp_path / "crawler.lock")
+    store = CatalogStore()
+    first = Crawler(OtakudesuScraper(), store, lock_path=lock_path)
+    second = Crawler(OtakudesuScraper(), store, lock_path=lock_path)
+    assert first.is_leader()
+    assert not second.is_leader()
+    assert first.is_leader()
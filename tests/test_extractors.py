@@ -0,0 +1,108 @@
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../bench')))
+
+from extractors import Extractor, find_extractor
+from scraper import OtakudesuScraper
+from stream_cache import StreamCache
+from bench_parse import load_fixture
+
+DESUSTREAM_URL = "https://desustream.info/dstream/ondesu/hd/v3/index.php?id=abc123"
+BLOGGER_URL = "https://www.blogger.com/video.g?token=AD6v5dyTESTTOKEN"
+
+
+def _page(name):
+    response = MagicMock()
+    response.status_code = 200
+    response.content = load_fixture(name)
+    return response
+
+
+def test_blogger_returns_every_quality():
+    """All VIDEO_CONFIG streams come back, highest quality first."""
+    streams, next_url = find_extractor(BLOGGER_URL).extract(load_fixture("blogger"), BLOGGER_URL)
+    assert next_url is None
+    assert [s['quality'] for s in streams] == ["720p", "360p"]
+    assert streams[0]['url'] == OtakudesuScraper().parse_blogger(
+        OtakudesuScraper().make_soup(load_fixture("blogger"), "blogger"))
+
+
+def test_desustream_points_at_blogger():
+    """The desustream player page yields its blogger iframe as the next hop."""
+    assert find_extractor(DESUSTREAM_URL).extract(load_fixture("desustream"), DESUSTREAM_URL) == ([], BLOGGER_URL)
+
+
+def test_pixeldrain_needs_no_fetch():
+    """Pixeldrain share links map straight to the file download URL."""
+    extractor = find_extractor("https://pixeldrain.com/u/AbC123")
+    assert extractor.direct("https://pixeldrain.com/u/AbC123")[0]['url'] == "https://pixeldrain.com/api/file/AbC123"
+
+
+def test_base_extractor_scans_source_tags_and_player_config():
+    """The base extractor scans for <source> tags and jwplayer-style source lists."""
+    body = (b'<video><source src="https://cdn.example/480.mp4?a=1&amp;b=2" label="480p"></video>'
+            b'<script>setup({sources: [{file: "https://cdn.example/1080.m3u8", label: "1080p"}]})</script>')
+    streams, _ = Extractor().extract(body, "https://filedon.co/embed/1")
+    assert [(s['url'], s['quality']) for s in streams] == [
+        ("https://cdn.example/1080.m3u8", "1080p"), ("https://cdn.example/480.mp4?a=1&b=2", "480p")]
+
+
+def test_extract_streams_follows_desustream_to_blogger():
+    """The scraper follows the desustream hop and keeps the old single-URL helpers working."""
+    scraper = OtakudesuScraper()
+    with patch('requests.Session.get', side_effect=[_page("desustream"), _page("blogger")] * 2) as mock_get:
+        streams = scraper.extract_streams(DESUSTREAM_URL)
+        assert len(streams) == 2 and mock_get.call_count == 2
+        assert scraper.extract_video_from_desustream(DESUSTREAM_URL) == streams[0]['url']
+
+
+def test_stream_cache_stores_stream_lists():
+    """Stream lists round-trip through the stream cache and expire with their earliest URL."""
+    cache = StreamCache()
+    streams = [{"url": "https://x.googlevideo.com/v?expire=1", "quality": "720p", "host": "blogger"}]
+    cache.set("expired", streams)
+    assert cache.get("expired") is None
+    streams[0]['url'] = "https://x.googlevideo.com/v?expire=4000000000"
+    cache.set("live", streams)
+    assert cache.get("live") == streams
+
+
+@pytest.mark.parametrize("url", [
+    "http://169.254.169.254/latest/meta-data?desustream",
+    "http://10.0.0.5:6379/?x=blogger.com/video",
+    "http://desustream.info.evil.example/embed",
+    "http://evil.example/#@desustream.info/embed",
+    "file:///etc/passwd?desustream.info",
+    "https://filedon.co/embed/1",
+])
+def test_only_registered_hostnames_match(url):
+    """Extractors match on the URL's hostname, not on text anywhere in the URL."""
+    assert find_extractor(url) is None
+
+
+def test_extract_streams_does_not_follow_hops_to_unregistered_hosts():
+    """An iframe pointing outside the registered hosts ends extraction without fetching it."""
+    page = MagicMock()
+    page.status_code = 200
+    page.content = b'<iframe src="http://127.0.0.1:8000/admin"></iframe>'
+    with patch('requests.Session.get', return_value=page) as mock_get:
+        assert OtakudesuScraper().extract_streams(DESUSTREAM_URL) == []
+        assert OtakudesuScraper().extract_streams("http://127.0.0.1:8000/admin?desustream") == []
+    assert mock_get.call_count == 1
+
+
+def test_alias_prefixes_map_stand_in_paths_to_extractors(monkeypatch):
+    """A stand-in origin's /_ext/ paths use the aliased extractor, without path traversal out of them."""
+    import extractors
+    monkeypatch.setattr(extractors, 'ALIASES', extractors.parse_aliases(
+        "desustream=http://127.0.0.1:8081/_ext/desustream/,blogger=http://127.0.0.1:8081/_ext/blogger/"))
+    assert find_extractor("http://127.0.0.1:8081/_ext/desustream/embed?id=1").name == "desustream"
+    assert find_extractor("http://127.0.0.1:8081/_ext/blogger/video.g?token=x").name == "blogger"
+    assert find_extractor("http://127.0.0.1:8081/_ext/desustream/../../admin") is None
+    assert find_extractor("http://127.0.0.1:8081/admin?/_ext/desustream/") is None
+    assert find_extractor("http://127.0.0.1:9999/_ext/desustream/embed") is None
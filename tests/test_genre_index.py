@@ -0,0 +1,47 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from genre_index import GenreIndex, genre_key
+
+
+def build_index():
+    index = GenreIndex()
+    index.add("naruto", "Naruto", genres=["Action", "Adventure", "Comedy"])
+    index.add("bocchi", "Bocchi the Rock", genres="Comedy, Music, Slice of Life")
+    index.add("frieren", "Frieren", genres=["Adventure", "Drama", "Fantasy"])
+    index.add_details("k-on", {"title": "K-On!", "genre": "Comedy, Music, Slice Of Life"})
+    return index
+
+
+def test_genre_key_normalises_names_and_slugs():
+    """Display names and upstream slugs map to the same key."""
+    assert genre_key("Slice of Life") == genre_key("slice-of-life") == "slice-of-life"
+
+
+def test_intersection_of_genres():
+    """Only anime tagged with every requested genre match, in title order."""
+    index = build_index()
+    entries, total = index.query(["comedy", "music"])
+    assert [e.slug for e in entries] == ["bocchi", "k-on"]
+    assert total == 2
+    assert [e.slug for e in index.query(["Adventure"])[0]] == ["frieren", "naruto"]
+    assert index.query(["action", "music"]) == ([], 0)
+    assert index.query(["unknown"]) == ([], 0)
+
+
+def test_reindexing_replaces_genres_and_paginates():
+    """Re-adding an anime moves it between genres; pages slice the sorted result."""
+    index = build_index()
+    index.add("naruto", "Naruto", genres=["Action"])
+    assert "naruto" not in [e.slug for e in index.query(["comedy"])[0]]
+    assert len(index) == 4
+
+    entries, total = index.query(["comedy"], page=2, per_page=1)
+    assert total == 2
+    assert [e.slug for e in entries] == ["k-on"]
+    counts = {key: count for key, _, count in index.genres()}
+    assert counts["comedy"] == 2 and counts["slice-of-life"] == 2
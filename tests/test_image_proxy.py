@@ -0,0 +1,80 @@
+import pytest
+import io
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from flask import Flask, request
+from image_proxy import DiskLRU, ImageProxy
+
+POSTER = "https://otakudesu.best/wp-content/uploads/poster.jpg"
+
+
+@pytest.fixture
+def proxy(tmp_path):
+    return ImageProxy(str(tmp_path / "images"), secret="test")
+
+
+def _image_response(width=900, height=1300):
+    Image = pytest.importorskip("PIL.Image")
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(out, "JPEG")
+    response = MagicMock()
+    response.headers = {"Content-Type": "image/jpeg"}
+    response.raw.read.return_value = out.getvalue()
+    response.__enter__.return_value = response
+    return response
+
+
+def test_rewrite_signs_image_fields_without_mutating(proxy):
+    """Every "image" field is rewritten to a signed /img/ URL on a copy of the data."""
+    data = {"ongoing": [{"title": "A", "image": POSTER}], "complete": [{"image": ""}]}
+    rewritten = proxy.rewrite(data)
+    assert rewritten["ongoing"][0]["image"].startswith(f"/img/{proxy.sign(POSTER)}?u=https%3A%2F%2F")
+    assert rewritten["complete"][0]["image"] == ""
+    assert data["ongoing"][0]["image"] == POSTER
+
+
+def test_disk_lru_evicts_oldest_across_workers(tmp_path):
+    """Instances sharing a directory keep it under one byte budget, evicting least recently used first."""
+    first, second = DiskLRU(str(tmp_path), max_bytes=25), DiskLRU(str(tmp_path), max_bytes=25)
+    first.set("a", b"x" * 10)
+    second.set("b", b"x" * 10)
+    os.utime(tmp_path / "a", (0, 1))
+    os.utime(tmp_path / "b", (0, 2))
+    assert first.get("a")
+    second.set("c", b"x" * 10)
+    assert first.get("b") is None and second.evictions == 1
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+    assert second.size == 20
+
+
+def test_serve_fetches_once_resizes_and_revalidates(proxy):
+    """Posters are fetched once, resized per format and answered with 304 when unchanged."""
+    Image = pytest.importorskip("PIL.Image")
+    app = Flask(__name__)
+    signature = proxy.sign(POSTER)
+    with patch('requests.Session.get', return_value=_image_response()) as mock_get:
+        with app.test_request_context(headers={"Accept": "image/webp,*/*"}):
+            response = proxy.serve(signature, POSTER, 300, request)
+            response.direct_passthrough = False
+            assert response.mimetype == "image/webp"
+            assert Image.open(io.BytesIO(response.get_data())).size[0] == 320
+            etag = response.headers["ETag"]
+        with app.test_request_context(headers={"Accept": "image/webp", "If-None-Match": etag}):
+            assert proxy.serve(signature, POSTER, 320, request).status_code == 304
+        with app.test_request_context(headers={"Accept": "image/jpeg"}):
+            assert proxy.serve(signature, POSTER, 320, request).mimetype == "image/jpeg"
+    assert mock_get.call_count == 2
+    assert proxy.stats()["hits"] == 1
+
+
+def test_serve_rejects_unsigned_urls(proxy):
+    """URLs without a valid signature are refused instead of being fetched."""
+    from werkzeug.exceptions import Forbidden
+    with Flask(__name__).test_request_context():
+        with pytest.raises(Forbidden):
+            proxy.serve("0" * 20, "http://127.0.0.1/internal", 320, request)
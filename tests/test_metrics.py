@@ -0,0 +1,55 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from metrics import Counter, Histogram, SlowRequestProfiler, phase, start_request, end_request
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Histogram exposition has cumulative buckets, +Inf, sum and count."""
+    h = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, "/")
+    h.observe(0.5, "/")
+    h.observe(5, "/")
+    lines = h.render()
+    assert 'test_seconds_bucket{route="/",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/"} 3' in lines
+
+
+def test_counter_escapes_labels():
+    """Label values are escaped in the exposition format."""
+    c = Counter("test_total", "Test.", ("error",))
+    c.inc('say "hi"')
+    assert 'test_total{error="say \\"hi\\""} 1' in c.render()
+
+
+def test_phases_accumulate_per_request():
+    """Timed blocks add up under their phase name for the current request."""
+    h = Histogram("test_phase_seconds", "Test.", ("page",))
+    start_request()
+    with phase("network", h, "home"):
+        pass
+    with phase("network", h, "anime"):
+        pass
+    with phase(None, h, "untracked"):
+        pass
+    phases = end_request()
+    assert set(phases) == {"network"}
+    assert h.count("home") == 1
+
+
+def test_profiler_keeps_slowest(tmp_path):
+    """Only the slowest sampled requests' profiles are kept on disk."""
+    profiler = SlowRequestProfiler(1.0, str(tmp_path), keep=2)
+    for elapsed in (0.3, 0.1, 0.5):
+        profile = profiler.start()
+        assert profile is not None
+        profiler.stop(profile, "/anime/x", elapsed)
+    kept = sorted(p.name for p in tmp_path.glob("*.prof"))
+    assert len(kept) == 2
+    assert kept[0].startswith("0000300.0ms")
@@ -0,0 +1,76 @@
+import pytest
+import io
+import json
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from otakudesu import Exporter
+
+
+class FakeScraper:
+    def __init__(self, episodes=5, broken=(), unresolvable=()):
+        self.episodes = [{"title": f"Episode {i}", "slug": f"ep-{i}"} for i in range(1, episodes + 1)]
+        self.broken = set(broken)
+        self.unresolvable = set(unresolvable)
+        self.resolved = []
+
+    def get_anime_details(self, slug):
+        return {"title": slug, "episodes": self.episodes}
+
+    def get_episode_details(self, slug):
+        if slug in self.broken:
+            return {}
+        return {"title": slug, "default_stream": "", "mirrors": {
+            "360p": [{"host": "a", "data_content": f"{slug}-360"}],
+            "720p": [{"host": "a", "data_content": f"{slug}-720a"}, {"host": "b", "data_content": f"{slug}-720b"}],
+        }}
+
+    def resolve_stream(self, data_content):
+        self.resolved.append(data_content)
+        if data_content.rsplit("-", 1)[0] in self.unresolvable:
+            return None
+        return f"https://stream.example/{data_content}"
+
+
+def test_export_writes_one_line_per_episode():
+    """Every episode is written once with all its mirrors resolved."""
+    out = io.StringIO()
+    exporter = Exporter(FakeScraper(), workers=3, log=io.StringIO())
+    assert exporter.export("anime", out) == 0
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r["episode"] for r in records) == [f"ep-{i}" for i in range(1, 6)]
+    assert records[0]["mirrors"]["720p"][1]["url"].startswith("https://stream.example/")
+    assert "data_content" not in records[0]["mirrors"]["720p"][0]
+    assert exporter.stats["resolved"] == exporter.stats["mirrors"] == 15
+
+
+def test_export_resumes_from_checkpoint(tmp_path):
+    """Failed and unresolved episodes are not checkpointed, so a rerun exports only those."""
+    checkpoint = str(tmp_path / "out.done")
+    out = io.StringIO()
+    scraper = FakeScraper(broken={"ep-2"}, unresolvable={"ep-3"})
+    assert Exporter(scraper, log=io.StringIO()).export("anime", out, checkpoint) == 2
+    assert sorted(json.loads(line)["episode"] for line in out.getvalue().splitlines()) == ["ep-1", "ep-4", "ep-5"]
+
+    scraper = FakeScraper()
+    out = io.StringIO()
+    assert Exporter(scraper, qualities=["720p"], log=io.StringIO()).export("anime", out, checkpoint) == 0
+    records = sorted((json.loads(line) for line in out.getvalue().splitlines()), key=lambda r: r["episode"])
+    assert [r["episode"] for r in records] == ["ep-2", "ep-3"]
+    assert list(records[0]["mirrors"]) == ["720p"]
+    assert sorted(scraper.resolved) == ["ep-2-720a", "ep-2-720b", "ep-3-720a", "ep-3-720b"]
+
+
+def test_partial_export_keeps_episodes_with_some_mirrors():
+    """With partial=True an episode with at least one resolved mirror is written and checkpointed."""
+    class HalfResolving(FakeScraper):
+        def resolve_stream(self, data_content):
+            return None if data_content.endswith("b") else super().resolve_stream(data_content)
+
+    out = io.StringIO()
+    assert Exporter(HalfResolving(episodes=2), partial=True, log=io.StringIO()).export("anime", out) == 0
+    record = json.loads(out.getvalue().splitlines()[0])
+    assert [m["url"] is not None for m in record["mirrors"]["720p"]] == [True, False]
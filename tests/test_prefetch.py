@@ -0,0 +1,73 @@
+import pytest
+import os
+import sys
+import threading
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from prefetch import Prefetcher
+
+EPISODE = {
+    "title": "Ep 2",
+    "mirrors": {
+        "360p": [{"host": "odstream", "data_content": "low"}],
+        "720p": [{"host": "mega", "data_content": "hd-mega"}, {"host": "desudrives", "data_content": "hd-desu"}],
+    },
+    "default_stream": "https://desustream.info/embed/2",
+}
+
+
+class FakeScraper:
+    def __init__(self, release=None):
+        self.calls = []
+        self.release = release
+
+    def get_episode_details(self, slug):
+        if self.release is not None:
+            self.release.wait(1)
+        self.calls.append(("details", slug))
+        return EPISODE
+
+    def resolve_stream(self, data_content):
+        self.calls.append(("resolve", data_content))
+        return "https://desustream.info/x"
+
+    def extract_video_from_desustream(self, url):
+        self.calls.append(("desustream", url))
+        return "https://video.example/x.mp4"
+
+
+def test_prefetch_warms_details_and_default_mirror():
+    """The next episode's page, preferred-quality mirror and default stream are fetched."""
+    fake = FakeScraper()
+    prefetcher = Prefetcher(fake)
+    assert prefetcher.schedule("ep-2")
+    prefetcher.executor.shutdown(wait=True)
+    assert fake.calls == [("details", "ep-2"), ("resolve", "hd-desu"),
+                          ("desustream", "https://desustream.info/embed/2")]
+    assert prefetcher.stats()["completed"] == 1
+
+
+def test_prefetch_skips_recent_and_busy():
+    """Repeated slugs and work beyond max_pending are dropped, not queued."""
+    release = threading.Event()
+    prefetcher = Prefetcher(FakeScraper(release), max_workers=1, max_pending=2)
+    assert prefetcher.schedule("a")
+    assert not prefetcher.schedule("a")
+    assert prefetcher.schedule("b")
+    assert not prefetcher.schedule("c")
+    release.set()
+    prefetcher.executor.shutdown(wait=True)
+    assert not prefetcher.schedule("a")
+    stats = prefetcher.stats()
+    assert (stats["skipped_recent"], stats["skipped_busy"], stats["completed"]) == (2, 1, 2)
+
+
+def test_prefetch_budget_limits_rate():
+    """Once the per-minute budget is spent, further schedules are skipped."""
+    prefetcher = Prefetcher(FakeScraper(), per_minute=4)
+    assert prefetcher.schedule("a")
+    assert not prefetcher.schedule("b")
+    assert prefetcher.stats()["skipped_budget"] == 1
+    prefetcher.shutdown()
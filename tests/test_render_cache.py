@@ -0,0 +1,75 @@
+import pytest
+import gzip
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from flask import Flask, request
+from render_cache import RenderCache, content_hash, templates_version
+from anime_index import AnimeEntry
+
+
+def test_content_hash_tracks_template_and_data():
+    """Equal contexts hash the same; a different template or value changes the hash."""
+    context = {"anime": {"title": "Naruto", "episodes": [1, 2]}}
+    assert content_hash("a.html", context) == content_hash("a.html", {"anime": {"episodes": [1, 2], "title": "Naruto"}})
+    assert content_hash("a.html", context) != content_hash("b.html", context)
+    assert content_hash("a.html", context) != content_hash("a.html", {"anime": {"title": "Bleach"}})
+    entries = [AnimeEntry("Naruto", "naruto", "https://example.com/anime/naruto/")]
+    assert content_hash("list.html", {"anime_list": entries})
+
+
+def test_unchanged_context_skips_rendering():
+    """A second request for the same data is served without calling render()."""
+    cache = RenderCache(compress_min_size=10)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return "<html>" + "x" * 100 + "</html>"
+
+    first = cache.get_or_render("a.html", {"n": 1}, render)
+    second = cache.get_or_render("a.html", {"n": 1}, render)
+    assert first is second
+    assert len(calls) == 1
+    assert gzip.decompress(first.gzip) == first.body
+    assert cache.stats()["hits"] == 1
+
+
+def test_respond_negotiates_encoding_and_revalidates():
+    """Clients get the gzip variant when they accept it and a 304 for a matching ETag."""
+    app = Flask(__name__)
+    cache = RenderCache(compress_min_size=10)
+    page = cache.get_or_render("a.html", {}, lambda: "<p>" + "hello " * 50 + "</p>")
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        response = cache.respond(page, request)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.get_data()) == page.body
+    etag = response.headers["ETag"]
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip", "If-None-Match": etag}):
+        response = cache.respond(page, request)
+    assert response.status_code == 304
+    assert response.get_data() == b""
+
+    with app.test_request_context():
+        response = cache.respond(page, request)
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == f'"{page.etag}"'
+
+
+def test_template_version_changes_etag(tmp_path):
+    """The same context rendered from edited templates gets a new ETag."""
+    (tmp_path / "a.html").write_text("<p>{{ n }}</p>")
+    before = templates_version(str(tmp_path))
+    (tmp_path / "a.html").write_text("<div>{{ n }}</div>")
+    after = templates_version(str(tmp_path))
+    assert before != after
+
+    old = RenderCache(version=before).get_or_render("a.html", {"n": 1}, lambda: "<p>1</p>")
+    new = RenderCache(version=after).get_or_render("a.html", {"n": 1}, lambda: "<div>1</div>")
+    assert old.etag != new.etag
@@ -0,0 +1,119 @@
+import pytest
+import os
+import sys
+import time
+from unittest.mock import MagicMock
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from resilience import TokenBucket, SharedTokenBucket, CircuitBreaker, CircuitOpenError, UpstreamGuard
+
+
+def _response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+def test_token_bucket_allows_burst_then_spaces_requests():
+    """The first ``capacity`` reservations are free; the next one waits about 1/rate."""
+    bucket = TokenBucket(rate=10, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+
+
+def test_breaker_opens_and_recovers_through_half_open():
+    """A failing window opens the breaker; after the cooldown one trial call decides."""
+    breaker = CircuitBreaker(threshold=0.5, window=4, min_calls=4, cooldown=0.05)
+    for success in (True, False, False, True):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_error_in_half_open_trial_reopens_breaker():
+    """A trial call failing with a non-retryable exception re-opens the breaker instead of wedging it."""
+    breaker = CircuitBreaker(window=2, min_calls=2, cooldown=0.05)
+    guard = UpstreamGuard(breaker=breaker, retries=0)
+    for _ in range(2):
+        guard.request(MagicMock(return_value=_response(500)))
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        guard.request(MagicMock(side_effect=ValueError("bad body")), retry_exceptions=(ConnectionError,))
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.06)
+    assert guard.request(MagicMock(return_value=_response(200))).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_guard_retries_server_errors_with_backoff():
+    """Retryable statuses are retried; the final response is returned."""
+    guard = UpstreamGuard(retries=2, base_delay=0.001)
+    send = MagicMock(side_effect=[_response(503), _response(502), _response(200)])
+    assert guard.request(send).status_code == 200
+    assert send.call_count == 3
+    assert guard.retried == 2
+
+
+def test_guard_does_not_retry_posts():
+    """Non-idempotent requests get a single attempt."""
+    guard = UpstreamGuard(retries=2, base_delay=0.001)
+    send = MagicMock(side_effect=ConnectionError("boom"))
+    with pytest.raises(ConnectionError):
+        guard.request(send, idempotent=False)
+    assert send.call_count == 1
+
+
+def test_guard_fails_fast_when_open():
+    """An open breaker rejects calls without touching upstream."""
+    guard = UpstreamGuard(breaker=CircuitBreaker(window=2, min_calls=2, cooldown=60), retries=0)
+    send = MagicMock(return_value=_response(500))
+    guard.request(send)
+    guard.request(send)
+    with pytest.raises(CircuitOpenError):
+        guard.request(send)
+    assert send.call_count == 2
+    assert guard.stats()["circuit_open"] == 1
+    assert guard.stats()["rejected"] == 1
+
+
+def test_challenge_403s_open_the_breaker_without_retries():
+    """A 403 is not retried but counts as a failure, unless the caller expects it."""
+    guard = UpstreamGuard(breaker=CircuitBreaker(window=2, min_calls=2, cooldown=60), retries=2)
+    send = MagicMock(return_value=_response(403))
+    guard.request(send, expected=(403,))
+    guard.request(send, expected=(403,))
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    guard.request(send)
+    assert send.call_count == 3
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+
+def test_backoff_honours_retry_after():
+    """A numeric Retry-After header sets the delay, capped at max_delay."""
+    guard = UpstreamGuard(max_delay=4.0)
+    assert guard.backoff(0, "2") == 2.0
+    assert guard.backoff(0, "120") == 4.0
+    assert 0 <= guard.backoff(3) <= 2.0
+
+
+def test_shared_bucket_is_one_budget_across_instances(tmp_path):
+    """Two buckets on the same file (as in two worker processes) draw from one budget."""
+    path = str(tmp_path / "rate.db")
+    first = SharedTokenBucket(path, rate=1, capacity=2)
+    second = SharedTokenBucket(path, rate=1, capacity=2)
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert second.reserve() > 0
+    second.reopen()
+    assert not second.try_acquire()
@@ -99,3 +99,95 @@ def test_get_episode_details_mock(scraper):
         assert '360p' in details['mirrors']
         assert details['mirrors']['360p'][0]['host'] == "Host1"
         assert details['default_stream'] == "https://desustream.com/embed"
+
+def test_anime_details_dedups_episodes(scraper):
+    """An episode listed in several episodelist blocks appears once, in first-seen order."""
+    from bs4 import BeautifulSoup
+    items = "".join(f'<li><a href="https://otakudesu.best/episode/ep-{n}/">Episode {n}</a></li>' for n in (3, 2, 1))
+    html = (f'<div class="episodelist"><ul>{items}</ul></div>'
+            f'<div class="episodelist"><ul>{items}</ul></div>')
+    details = scraper.parse_anime_details(BeautifulSoup(html, 'lxml'), "fixture")
+    assert [ep['slug'] for ep in details['episodes']] == ["ep-3", "ep-2", "ep-1"]
+
+def _ajax_response(status_code=200, body=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = body
+    return response
+
+def test_resolve_stream_caches_nonce(scraper):
+    """The nonce is fetched once and refreshed only when upstream rejects it."""
+    import base64, json
+    data_content = base64.b64encode(json.dumps({"id": 1, "i": 0, "q": "720p"}).encode()).decode()
+    embed = base64.b64encode(b'<iframe src="https://desustream.com/embed/1"></iframe>').decode()
+
+    with patch('requests.Session.post') as mock_post:
+        mock_post.side_effect = [
+            _ajax_response(body={"data": "nonce-1"}),
+            _ajax_response(body={"data": embed}),
+            _ajax_response(body={"data": embed}),
+            _ajax_response(status_code=403, body=-1),
+            _ajax_response(body={"data": "nonce-2"}),
+            _ajax_response(body={"data": embed}),
+        ]
+        assert scraper.resolve_stream(data_content) == "https://desustream.com/embed/1"
+        assert scraper.resolve_stream(data_content) == "https://desustream.com/embed/1"
+        assert mock_post.call_count == 3
+
+        assert scraper.resolve_stream(data_content) == "https://desustream.com/embed/1"
+        assert mock_post.call_count == 6
+        assert mock_post.call_args.kwargs['data']['nonce'] == "nonce-2"
+
+def test_rejected_nonce_is_refreshed_once(scraper):
+    """Resolves rejected with a nonce another thread already replaced reuse the replacement."""
+    scraper.store_nonce("nonce-2")
+    with patch('requests.Session.post', return_value=_ajax_response(body={"data": "nonce-3"})) as mock_post:
+        assert scraper._get_nonce(rejected="nonce-1") == "nonce-2"
+        assert mock_post.call_count == 0
+        assert scraper._get_nonce(rejected="nonce-2") == "nonce-3"
+        assert mock_post.call_count == 1
+
+def test_resolve_streams_batch(scraper):
+    """Batch resolution deduplicates payloads and maps each to its URL."""
+    with patch.object(OtakudesuScraper, 'resolve_stream', side_effect=lambda dc: f"https://example.com/{dc}"):
+        urls = scraper.resolve_streams(["a", "b", "a", None])
+    assert urls == {"a": "https://example.com/a", "b": "https://example.com/b"}
+
+@pytest.mark.parametrize("page", ["home", "ongoing", "anime_list", "genre_list", "genre", "search",
+                                  "anime_details", "episode_details", "desustream", "blogger"])
+def test_strained_parse_matches_full_parse(page):
+    """Subtree-filtered parsing yields the same dicts as a full parse on fixture pages."""
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../bench')))
+    from bench_parse import PARSERS, load_fixture
+
+    content = load_fixture(page)
+    full = OtakudesuScraper(strained_pages=())
+    strained = OtakudesuScraper(strained_pages=PARSERS)
+    expected = PARSERS[page](full, full.make_soup(content, page))
+    assert expected
+    assert PARSERS[page](strained, strained.make_soup(content, page)) == expected
+
+def test_scraper_against_stand_in_origin(monkeypatch):
+    """The fixtures served by bench/origin.py round-trip through every page method and stream hop."""
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../bench')))
+    import extractors
+    from origin import StandInOrigin
+    from bench_app import DATA_CONTENT
+
+    origin = StandInOrigin()
+    scraper = OtakudesuScraper(base_url=origin.start())
+    monkeypatch.setattr(extractors, 'ALIASES', origin.extractor_aliases())
+    try:
+        assert len(scraper.get_home()['ongoing']) > 0
+        assert len(scraper.get_anime_list()) > 0
+        assert scraper.get_genre_anime("action", 2)[0]['genres']
+        assert len(scraper.get_anime_details("fixture")['episodes']) > 0
+        episode = scraper.get_episode_details("fixture")
+        assert episode['mirrors']
+        embed_url = scraper.resolve_stream(DATA_CONTENT)
+        assert embed_url.startswith(origin.base_url + "/_ext/desustream/")
+        assert episode['default_stream'].startswith(origin.base_url + "/_ext/desustream/")
+        streams = scraper.extract_streams(embed_url)
+        assert [s['quality'] for s in streams] == ["720p", "360p"]
+    finally:
+        origin.stop()
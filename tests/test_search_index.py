@@ -0,0 +1,88 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from search_index import SearchIndex, SearchIndexer
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add("one-piece-sub-indo", "One Piece", genres="Action, Adventure, Comedy", studio="Toei Animation")
+    index.add("one-punch-man-sub-indo", "One Punch Man", genres=["Action", "Comedy"], studio="Madhouse")
+    index.add("jujutsu-kaisen-sub-indo", "Jujutsu Kaisen", genres="Action, Supernatural", studio="MAPPA")
+    return index
+
+
+def test_exact_and_ranked(index):
+    """Title matches rank above genre-only matches."""
+    results = index.search("one")
+    assert [r['slug'] for r in results] == ["one-piece-sub-indo", "one-punch-man-sub-indo"]
+    assert results[0]['genres'] == ["Action", "Adventure", "Comedy"]
+
+
+def test_all_terms_must_match(index):
+    """Multi-term queries intersect their matches."""
+    assert [r['slug'] for r in index.search("one madhouse")] == ["one-punch-man-sub-indo"]
+    assert index.search("one mappa") == []
+
+
+def test_prefix_and_fuzzy(index):
+    """Partial words match by prefix and misspellings by close spelling."""
+    assert index.search("juju")[0]['slug'] == "jujutsu-kaisen-sub-indo"
+    assert index.search("jujutsu kaisne")[0]['slug'] == "jujutsu-kaisen-sub-indo"
+
+
+def test_reindexing_replaces_old_tokens(index):
+    """Re-adding a slug drops the tokens of its previous version."""
+    index.add("one-piece-sub-indo", "Wan Pisu")
+    assert [r['slug'] for r in index.search("piece")] == []
+    assert index.search("wan")[0]['slug'] == "one-piece-sub-indo"
+
+
+def test_indexer_enriches_incrementally():
+    """The indexer loads titles first, then details a bounded batch per pass."""
+    class FakeScraper:
+        def get_anime_list(self):
+            return [{"title": f"Anime {i}", "slug": f"anime-{i}", "url": ""} for i in range(3)]
+
+        def get_anime_details(self, slug):
+            return {"title": slug, "genre": "Mecha", "studio": "Sunrise", "status": "Ongoing"}
+
+    indexer = SearchIndexer(FakeScraper(), details_per_pass=2, detail_delay=0)
+    indexer.refresh()
+    assert len(indexer.index) == 3
+    assert len(indexer.index.search("mecha")) == 2
+    indexer.refresh()
+    assert len(indexer.index.search("mecha")) == 3
+
+
+def test_failing_titles_do_not_block_enrichment():
+    """Titles whose details fail are backed off, so the rest of the list still gets enriched."""
+    class FakeScraper:
+        def __init__(self):
+            self.tried = []
+
+        def get_anime_list(self):
+            return [{"title": f"Anime {i}", "slug": f"anime-{i:02d}", "url": ""} for i in range(30)]
+
+        def get_anime_details(self, slug):
+            self.tried.append(slug)
+            if int(slug[-2:]) < 25:
+                return None
+            return {"title": slug, "genre": "Mecha", "studio": "Sunrise", "status": "Ongoing"}
+
+    scraper = FakeScraper()
+    indexer = SearchIndexer(scraper, details_per_pass=25, detail_delay=0, retry_delay=60)
+    for _ in range(2):
+        indexer.refresh()
+    assert len(indexer.index.search("mecha")) == 5
+    assert len(scraper.tried) == 30
+
+    indexer._failures = {slug: (attempts, 0) for slug, (attempts, _) in indexer._failures.items()}
+    indexer.refresh()
+    assert len(scraper.tried) == 55
+    assert indexer._failures["anime-00"][0] == 2
@@ -0,0 +1,49 @@
+import pytest
+import json
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import serialize
+from serialize import parse_fields, project, encode
+
+ANIME = {
+    "title": "Naruto",
+    "synopsis": "A long text",
+    "episodes": [{"title": "Episode 1", "slug": "ep-1", "date": "1 Jan"},
+                 {"title": "Episode 2", "slug": "ep-2", "date": "8 Jan"}],
+}
+
+
+def test_parse_fields_builds_nested_tree():
+    """Dotted paths nest, and a bare name selects the whole value."""
+    assert parse_fields("title, episodes.slug,episodes.title") == {"title": None, "episodes": {"slug": None, "title": None}}
+    assert parse_fields("episodes.slug,episodes") == {"episodes": None}
+    assert parse_fields("episodes,episodes.slug") == {"episodes": None}
+
+
+def test_project_keeps_selected_fields_through_lists():
+    """Projection walks into lists and drops unknown fields silently."""
+    projected = project(ANIME, parse_fields("title,episodes.slug,missing"))
+    assert projected == {"title": "Naruto", "episodes": [{"slug": "ep-1"}, {"slug": "ep-2"}]}
+    assert project([ANIME], parse_fields("title")) == [{"title": "Naruto"}]
+
+
+def test_encode_is_compact_json(monkeypatch):
+    """The stdlib fallback produces the same compact JSON as orjson."""
+    body, mimetype = encode(ANIME)
+    assert mimetype == "application/json"
+    monkeypatch.setattr(serialize, "orjson", None)
+    fallback, _ = encode(ANIME)
+    assert json.loads(body) == json.loads(fallback) == ANIME
+    assert b": " not in fallback
+
+
+def test_encode_msgpack():
+    """msgpack output round-trips when the module is installed."""
+    msgpack = pytest.importorskip("msgpack")
+    body, mimetype = encode(ANIME, as_msgpack=True)
+    assert mimetype == "application/msgpack"
+    assert msgpack.unpackb(body, raw=False) == ANIME
@@ -0,0 +1,76 @@
+import pytest
+import os
+import sys
+import threading
+import time
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from singleflight import SingleFlight
+from cache import CachedScraper, ResponseCache
+
+
+def run_concurrently(n, fn):
+    results = [None] * n
+
+    def worker(i):
+        results[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    """Callers arriving while a key is in flight receive the leader's result."""
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "page"
+
+    results = run_concurrently(8, lambda: flight.do("url", slow))
+    assert results == ["page"] * 8
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_errors_propagate_to_waiters():
+    """An exception in the leader is raised in every coalesced caller."""
+    flight = SingleFlight()
+
+    def boom():
+        time.sleep(0.05)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flight.do("url", boom)
+        except ValueError as e:
+            return str(e)
+
+    assert run_concurrently(4, call) == ["upstream down"] * 4
+    assert flight.in_flight() == 0
+
+
+def test_cached_scraper_coalesces_resolve_stream():
+    """Concurrent resolve_stream calls for one data_content hit upstream once."""
+    class SlowScraper:
+        calls = 0
+
+        def resolve_stream(self, data_content):
+            SlowScraper.calls += 1
+            time.sleep(0.1)
+            return f"https://example.com/{data_content}"
+
+    scraper = CachedScraper(SlowScraper(), ResponseCache())
+    results = run_concurrently(5, lambda: scraper.resolve_stream("abc"))
+    assert results == ["https://example.com/abc"] * 5
+    assert SlowScraper.calls == 1
+    assert scraper.flight.coalesced == 4
@@ -0,0 +1,58 @@
+import pytest
+import os
+import sys
+import time
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from stream_cache import StreamCache, parse_expiry
+from cache import CachedScraper, ResponseCache
+
+
+def test_parse_expiry():
+    """The expire= hint of googlevideo URLs is extracted."""
+    assert parse_expiry("https://r1.googlevideo.com/videoplayback?expire=1700000000&id=x") == 1700000000
+    assert parse_expiry("https://desustream.com/embed/1") is None
+
+
+def test_expired_urls_are_not_served(tmp_path):
+    """Entries past their encoded expiry are evicted on read."""
+    cache = StreamCache(str(tmp_path / "streams.db"))
+    soon = int(time.time()) + StreamCache.EXPIRY_MARGIN + 1
+    cache.set("a", f"https://r1.googlevideo.com/videoplayback?expire={soon}")
+    cache.set("b", "https://desustream.com/embed/1")
+    cache.set("c", "https://r1.googlevideo.com/videoplayback?expire=1")
+    assert cache.get("a") is not None
+    assert cache.get("b") == "https://desustream.com/embed/1"
+    assert cache.get("c") is None
+
+    time.sleep(1.1)
+    assert cache.get("a") is None
+
+
+def test_store_is_purged_and_bounded_on_writes(tmp_path):
+    """Every purge_every writes the store drops expired rows and keeps at most max_entries."""
+    cache = StreamCache(str(tmp_path / "streams.db"), max_entries=2, purge_every=3)
+    for i in range(3):
+        cache.set(f"k{i}", f"https://r1.googlevideo.com/videoplayback?expire={4000000000 + i}")
+    assert cache.get("k0") is None
+    assert cache.get("k1") and cache.get("k2")
+
+
+def test_cached_scraper_serves_resolved_streams_across_instances(tmp_path):
+    """A second process sharing the store resolves without upstream traffic."""
+    class FakeScraper:
+        calls = 0
+
+        def resolve_stream(self, data_content):
+            FakeScraper.calls += 1
+            return f"https://desustream.com/embed/{data_content}"
+
+    path = str(tmp_path / "streams.db")
+    first = CachedScraper(FakeScraper(), ResponseCache(), streams=StreamCache(path))
+    second = CachedScraper(FakeScraper(), ResponseCache(), streams=StreamCache(path))
+    assert first.resolve_stream("abc") == "https://desustream.com/embed/abc"
+    assert second.resolve_stream("abc") == "https://desustream.com/embed/abc"
+    assert FakeScraper.calls == 1
+    assert second.streams.stats() == {"hits": 1, "misses": 0}
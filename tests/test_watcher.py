@@ -0,0 +1,133 @@
+import pytest
+import os
+import sys
+
+# Add src to python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from cache import CachedScraper, ResponseCache
+from watcher import EpisodeWatcher, EventLog
+
+
+class FakeScraper:
+    def __init__(self):
+        self.home = [{"slug": "a", "title": "A", "episode": "Episode 1"},
+                     {"slug": "b", "title": "B", "episode": "Episode 5"}]
+        self.ongoing = [{"slug": "d", "title": "D", "episode": "Episode 7"}]
+        self.calls = 0
+
+    def get_home(self):
+        self.calls += 1
+        return {"ongoing": list(self.home), "complete": []}
+
+    def get_ongoing_anime(self, page=1):
+        self.calls += 1
+        return list(self.ongoing)
+
+
+def test_first_poll_is_baseline_then_changes_are_events():
+    """Only episodes that change after the first snapshot are published."""
+    scraper = FakeScraper()
+    watcher = EpisodeWatcher(scraper)
+    assert watcher.poll() == []
+
+    scraper.home[0] = {"slug": "a", "title": "A", "episode": "Episode 2"}
+    scraper.ongoing = [{"slug": "c", "title": "C", "episode": "Episode 1"}]
+    events = watcher.poll()
+    assert [(e['slug'], e['episode']) for e in events] == [("a", "Episode 2"), ("c", "Episode 1")]
+    assert [e['id'] for e in events] == [1, 2]
+    assert watcher.poll() == []
+
+
+def test_empty_fetch_keeps_snapshot():
+    """An upstream failure does not make every title look new afterwards."""
+    scraper = FakeScraper()
+    watcher = EpisodeWatcher(scraper)
+    watcher.poll()
+    home, scraper.home = scraper.home, []
+    assert watcher.poll() == []
+    scraper.home = home
+    assert watcher.poll() == []
+
+
+def test_partial_fetch_does_not_drop_titles_from_the_snapshot():
+    """Titles on a page that failed once are not reported as new when it comes back."""
+    scraper = FakeScraper()
+    scraper.ongoing = [{"slug": "c", "title": "C", "episode": "Episode 1"}]
+    watcher = EpisodeWatcher(scraper)
+    watcher.poll()
+    ongoing, scraper.ongoing = scraper.ongoing, []
+    scraper.home[0] = {"slug": "a", "title": "A", "episode": "Episode 2"}
+    assert [e['slug'] for e in watcher.poll()] == ["a"]
+    scraper.ongoing = ongoing
+    assert watcher.poll() == []
+
+
+def test_subscribers_receive_events_and_replay_missed_ones():
+    """Live subscribers get new events; a reconnect with Last-Event-ID replays the gap."""
+    watcher = EpisodeWatcher(FakeScraper())
+    live = watcher.subscribe()
+    watcher.publish({"type": "new_episode", "slug": "a"})
+    watcher.publish({"type": "new_episode", "slug": "b"})
+    assert live.get_nowait()['slug'] == "a"
+
+    replay = watcher.subscribe(last_event_id=1)
+    assert replay.get_nowait()['slug'] == "b"
+    assert replay.empty()
+
+
+def test_stream_formats_server_sent_events():
+    """The stream yields id/event/data frames and keepalive comments when idle."""
+    watcher = EpisodeWatcher(FakeScraper())
+    watcher.publish({"type": "new_episode", "slug": "a"})
+    stream = watcher.stream(last_event_id=0, heartbeat=0.01)
+    assert next(stream).startswith("retry:")
+    frame = next(stream)
+    assert frame.startswith("id: 1\nevent: new_episode\ndata: {")
+    assert next(stream) == ": keepalive\n\n"
+    stream.close()
+    assert watcher.stats()['subscribers'] == 0
+
+
+def test_streams_are_capped_and_bounded_in_time():
+    """Past max_subscribers new clients are refused, and every stream ends after max_stream_seconds."""
+    watcher = EpisodeWatcher(FakeScraper(), max_subscribers=1, max_stream_seconds=0.05)
+    subscription = watcher.subscribe()
+    assert watcher.subscribe() is None and watcher.stats()['rejected'] == 1
+    frames = list(watcher.stream(subscription=subscription, heartbeat=0.01))
+    assert frames[0].startswith("retry:") and frames[-1] == ": keepalive\n\n"
+    assert watcher.stats()['subscribers'] == 0
+    assert watcher.subscribe() is not None
+
+
+def test_poll_primes_response_cache():
+    """Pages fetched by the watcher are served from the cache without another upstream call."""
+    scraper = FakeScraper()
+    scraper.ongoing = [{"slug": "c", "title": "C", "episode": "Episode 1"}]
+    cached = CachedScraper(scraper, ResponseCache())
+    EpisodeWatcher(scraper, cache=cached).poll()
+    calls = scraper.calls
+    assert cached.get_home()['ongoing'][0]['slug'] == "a"
+    assert cached.get_ongoing_anime(1)[0]['slug'] == "c"
+    assert scraper.calls == calls
+
+
+def test_workers_share_one_poller_and_event_ids(tmp_path):
+    """Only the lock holder polls; other workers fan out the same numbered events from the shared log."""
+    db, lock_path = str(tmp_path / "events.db"), str(tmp_path / "watcher.lock")
+    scraper = FakeScraper()
+    leader = EpisodeWatcher(scraper, log=EventLog(db), lock_path=lock_path)
+    follower = EpisodeWatcher(FakeScraper(), log=EventLog(db), lock_path=lock_path)
+    assert leader.leader.acquire() and not follower.leader.acquire()
+
+    leader.poll()
+    live = follower.subscribe()
+    scraper.home[0] = {"slug": "a", "title": "A", "episode": "Episode 2"}
+    assert [e['id'] for e in leader.poll()] == [1]
+    follower.deliver()
+    assert live.get_nowait() == leader.log.since(0)[0]
+    assert follower.subscribe(last_event_id=0).get_nowait()['slug'] == "a"
+
+    restarted = EpisodeWatcher(scraper, log=EventLog(db))
+    assert restarted.poll() == []
+    assert restarted.publish({"type": "new_episode", "slug": "b"})['id'] == 2